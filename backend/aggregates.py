@@ -0,0 +1,412 @@
+"""
+Per-user aggregate tables maintained at import and profile-update time
+"""
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models import User
+from leaderboard_events import notify_leaderboard_change
+from observation_loader import IMPORTED_TABLE
+from taxonomy import COUNTABLE_NAME_SQL
+
+# Rarest new species named in an activity feed event
+NOTABLE_SPECIES_LIMIT = 3
+
+# Upserts user_year_summary rows computed from one year of observations
+_SUMMARY_UPSERT = f"""
+    INSERT INTO user_year_summary (
+        user_id, year, user_name, user_email, privacy_level, species_count,
+        total_observations, states_visited, last_observation_date, last_upload_date, updated_at
+    )
+    SELECT
+        u.id,
+        :year,
+        u.name,
+        u.email,
+        u.privacy_level,
+        COUNT(DISTINCT o.scientific_name) FILTER (WHERE o.countable),
+        COUNT(o.id),
+        COUNT(DISTINCT o.state_province),
+        MAX(o.observation_date) FILTER (WHERE o.countable),
+        MAX(o.uploaded_at) FILTER (WHERE o.countable),
+        NOW()
+    FROM users u
+    LEFT JOIN observations o ON u.id = o.user_id
+        AND o.observation_date >= make_date(:year, 1, 1)
+        AND o.observation_date < make_date(:year + 1, 1, 1)
+    {{user_filter}}
+    GROUP BY u.id, u.name, u.email, u.privacy_level
+    ON CONFLICT (user_id, year) DO UPDATE SET
+        user_name = EXCLUDED.user_name,
+        user_email = EXCLUDED.user_email,
+        privacy_level = EXCLUDED.privacy_level,
+        species_count = EXCLUDED.species_count,
+        total_observations = EXCLUDED.total_observations,
+        states_visited = EXCLUDED.states_visited,
+        last_observation_date = EXCLUDED.last_observation_date,
+        last_upload_date = EXCLUDED.last_upload_date,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def refresh_user_year_summary(db: Session, user_id: int, year: int):
+    """
+    Recompute one user's leaderboard row for a year.
+    Only that user's observations are aggregated (idx_obs_user_date).
+    """
+    db.execute(
+        text(_SUMMARY_UPSERT.format(user_filter="WHERE u.id = :user_id")),
+        {"user_id": user_id, "year": year}
+    )
+
+
+def backfill_user_year_summary(db: Session, year: int):
+    """Compute leaderboard rows for every user (one-time, used by migrations)"""
+    db.execute(text(_SUMMARY_UPSERT.format(user_filter="")), {"year": year})
+
+
+def sync_user_profile(db: Session, user: User):
+    """Copy a user's name and privacy level into their summary rows for all years"""
+    db.execute(text("""
+        UPDATE user_year_summary
+        SET user_name = :name, user_email = :email, privacy_level = :privacy_level, updated_at = NOW()
+        WHERE user_id = :user_id
+    """), {
+        "user_id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "privacy_level": user.privacy_level
+    })
+    notify_leaderboard_change(db, user.id, None, "profile")
+
+
+def apply_imported_observations(db: Session, user_id: int, year: int):
+    """
+    Fold the rows inserted by the current import into the user's aggregates.
+    Must run in the import transaction, before the imported_observations temp table is dropped.
+    """
+    new_species = upsert_year_species(db, user_id, year)
+    upsert_geographic_stats(db, user_id, year)
+    _update_summary_from_import(db, user_id, year)
+    upsert_monthly_stats(db, user_id, year)
+    record_import_event(db, user_id, year, new_species)
+    notify_leaderboard_change(db, user_id, year, "import")
+
+
+def upsert_year_species(db: Session, user_id: int, year: int) -> List[str]:
+    """
+    Add new species to the user's year list and move first sightings earlier.
+    Returns the scientific names of countable species new to the list.
+    """
+    rows = db.execute(text(f"""
+        INSERT INTO user_year_species (
+            user_id, year, scientific_name, common_name, first_observation_date, state_province, countable
+        )
+        SELECT DISTINCT ON (scientific_name)
+            :user_id, :year, scientific_name, common_name, observation_date, state_province, countable
+        FROM {IMPORTED_TABLE}
+        ORDER BY scientific_name, observation_date ASC
+        ON CONFLICT (user_id, year, scientific_name) DO UPDATE SET
+            common_name = EXCLUDED.common_name,
+            countable = EXCLUDED.countable,
+            first_observation_date = EXCLUDED.first_observation_date,
+            state_province = EXCLUDED.state_province
+        WHERE EXCLUDED.first_observation_date < user_year_species.first_observation_date
+        RETURNING scientific_name, countable, xmax = 0 AS inserted
+    """), {"user_id": user_id, "year": year})
+    return [row.scientific_name for row in rows if row.inserted and row.countable]
+
+
+def record_import_event(db: Session, user_id: int, year: int, new_species: List[str]):
+    """
+    Append the import to the activity log. Notable species are the new ones
+    the fewest participants have on their year list at import time.
+    """
+    db.execute(text(f"""
+        INSERT INTO import_events (user_id, year, observations_added, species_added, notable_species)
+        SELECT
+            :user_id,
+            :year,
+            (SELECT COUNT(*) FROM {IMPORTED_TABLE}),
+            :species_added,
+            ARRAY(
+                SELECT s.common_name
+                FROM user_year_species s
+                WHERE s.user_id = :user_id AND s.year = :year
+                AND s.scientific_name = ANY(CAST(:new_species AS VARCHAR[]))
+                ORDER BY (
+                    SELECT COUNT(*) FROM user_year_species o
+                    WHERE o.year = :year AND o.scientific_name = s.scientific_name
+                ), s.common_name
+                LIMIT :notable_limit
+            )
+    """), {
+        "user_id": user_id,
+        "year": year,
+        "species_added": len(new_species),
+        "new_species": new_species,
+        "notable_limit": NOTABLE_SPECIES_LIMIT
+    })
+
+
+def _update_summary_from_import(db: Session, user_id: int, year: int):
+    """
+    Update the leaderboard and profile row from the year list and the newly imported rows.
+    Runs after upsert_geographic_stats, which maintains the states counted here.
+    """
+    db.execute(text(f"""
+        INSERT INTO user_year_summary (
+            user_id, year, user_name, user_email, privacy_level, species_count,
+            total_observations, states_visited, last_observation_date, last_upload_date, updated_at
+        )
+        SELECT
+            u.id,
+            :year,
+            u.name,
+            u.email,
+            u.privacy_level,
+            (
+                SELECT COUNT(*) FROM user_year_species
+                WHERE user_id = :user_id AND year = :year AND countable
+            ),
+            i.total_observations,
+            (
+                SELECT COUNT(*) FROM user_state_stats
+                WHERE user_id = :user_id AND year = :year
+            ),
+            i.last_observation_date,
+            CASE WHEN i.last_observation_date IS NOT NULL THEN NOW() END,
+            NOW()
+        FROM users u
+        CROSS JOIN (
+            SELECT
+                COUNT(*) AS total_observations,
+                MAX(observation_date) FILTER (WHERE countable) AS last_observation_date
+            FROM {IMPORTED_TABLE}
+        ) i
+        WHERE u.id = :user_id
+        ON CONFLICT (user_id, year) DO UPDATE SET
+            species_count = EXCLUDED.species_count,
+            total_observations = user_year_summary.total_observations + EXCLUDED.total_observations,
+            states_visited = EXCLUDED.states_visited,
+            last_observation_date = GREATEST(user_year_summary.last_observation_date, EXCLUDED.last_observation_date),
+            last_upload_date = COALESCE(EXCLUDED.last_upload_date, user_year_summary.last_upload_date),
+            updated_at = EXCLUDED.updated_at
+    """), {"user_id": user_id, "year": year})
+
+
+def upsert_geographic_stats(db: Session, user_id: int, year: int):
+    """
+    Fold imported rows into the per-year county and state aggregates.
+    Species sets live in user_county_species, so only the counties and states
+    the import touched are recounted, and state totals count each species once
+    however many of its counties it was seen in.
+    """
+    params = {"user_id": user_id, "year": year}
+    db.execute(text(f"""
+        INSERT INTO user_county_species (user_id, year, state_province, county, scientific_name)
+        SELECT DISTINCT :user_id, :year, state_province, COALESCE(county, ''), scientific_name
+        FROM {IMPORTED_TABLE}
+        WHERE state_province IS NOT NULL AND countable
+        ON CONFLICT DO NOTHING
+    """), params)
+    db.execute(text(f"""
+        INSERT INTO geographic_stats (
+            user_id, year, state_province, county, species_count, first_observation, last_observation
+        )
+        SELECT
+            :user_id,
+            :year,
+            i.state_province,
+            i.county,
+            (
+                SELECT COUNT(*) FROM user_county_species c
+                WHERE c.user_id = :user_id AND c.year = :year
+                AND c.state_province = i.state_province AND c.county = COALESCE(i.county, '')
+            ),
+            MIN(i.observation_date),
+            MAX(i.observation_date)
+        FROM {IMPORTED_TABLE} i
+        WHERE i.state_province IS NOT NULL
+        GROUP BY i.state_province, i.county
+        ON CONFLICT (user_id, year, state_province, COALESCE(county, '')) DO UPDATE SET
+            species_count = EXCLUDED.species_count,
+            first_observation = LEAST(geographic_stats.first_observation, EXCLUDED.first_observation),
+            last_observation = GREATEST(geographic_stats.last_observation, EXCLUDED.last_observation)
+    """), params)
+    db.execute(text(f"""
+        INSERT INTO user_state_stats (
+            user_id, year, state_province, species_count, first_observation, last_observation
+        )
+        SELECT
+            :user_id,
+            :year,
+            i.state_province,
+            (
+                SELECT COUNT(DISTINCT c.scientific_name) FROM user_county_species c
+                WHERE c.user_id = :user_id AND c.year = :year AND c.state_province = i.state_province
+            ),
+            MIN(i.observation_date),
+            MAX(i.observation_date)
+        FROM {IMPORTED_TABLE} i
+        WHERE i.state_province IS NOT NULL
+        GROUP BY i.state_province
+        ON CONFLICT (user_id, year, state_province) DO UPDATE SET
+            species_count = EXCLUDED.species_count,
+            first_observation = LEAST(user_state_stats.first_observation, EXCLUDED.first_observation),
+            last_observation = GREATEST(user_state_stats.last_observation, EXCLUDED.last_observation)
+    """), params)
+
+
+def backfill_geographic_stats(db: Session, year: int):
+    """Rebuild every user's county and state aggregates for a year (one-time, used by migrations)"""
+    params = {"year": year}
+    year_filter = """
+        state_province IS NOT NULL
+        AND observation_date >= make_date(:year, 1, 1)
+        AND observation_date < make_date(:year + 1, 1, 1)
+    """
+    for table in ("user_county_species", "geographic_stats", "user_state_stats"):
+        db.execute(text(f"DELETE FROM {table} WHERE year = :year"), params)
+    db.execute(text(f"""
+        INSERT INTO user_county_species (user_id, year, state_province, county, scientific_name)
+        SELECT DISTINCT user_id, :year, state_province, COALESCE(county, ''), scientific_name
+        FROM observations
+        WHERE {year_filter} AND countable
+    """), params)
+    db.execute(text(f"""
+        INSERT INTO geographic_stats (
+            user_id, year, state_province, county, species_count, first_observation, last_observation
+        )
+        SELECT
+            user_id, :year, state_province, county,
+            COUNT(DISTINCT scientific_name) FILTER (WHERE countable),
+            MIN(observation_date),
+            MAX(observation_date)
+        FROM observations
+        WHERE {year_filter}
+        GROUP BY user_id, state_province, county
+    """), params)
+    db.execute(text(f"""
+        INSERT INTO user_state_stats (
+            user_id, year, state_province, species_count, first_observation, last_observation
+        )
+        SELECT
+            user_id, :year, state_province,
+            COUNT(DISTINCT scientific_name) FILTER (WHERE countable),
+            MIN(observation_date),
+            MAX(observation_date)
+        FROM observations
+        WHERE {year_filter}
+        GROUP BY user_id, state_province
+    """), params)
+
+
+# Year-list figures per month from user_year_species: species_count is the
+# cumulative list size at month end, new_species_count the first sightings in it
+_MONTH_FIGURES = """
+    firsts AS (
+        SELECT user_id, EXTRACT(MONTH FROM first_observation_date)::INTEGER AS month, COUNT(*) AS new_species
+        FROM user_year_species
+        WHERE year = :year AND countable {user_filter}
+        GROUP BY user_id, EXTRACT(MONTH FROM first_observation_date)
+    )
+"""
+
+_MONTH_SPECIES_COUNT = """
+    (SELECT COALESCE(SUM(f.new_species), 0) FROM firsts f WHERE f.user_id = m.user_id AND f.month <= m.month)
+"""
+
+_MONTH_NEW_SPECIES = """
+    COALESCE((SELECT f.new_species FROM firsts f WHERE f.user_id = m.user_id AND f.month = m.month), 0)
+"""
+
+
+def upsert_monthly_stats(db: Session, user_id: int, year: int):
+    """
+    Update progress-chart rows for the months an import can affect.
+    Observation totals grow by the imported rows of each touched month; year-list
+    figures are recomputed from user_year_species (not raw observations) for every
+    month from the earliest touched one, since moved first sightings shift them.
+    Runs after upsert_year_species, in the import transaction.
+    """
+    db.execute(text(f"""
+        WITH touched AS (
+            SELECT EXTRACT(MONTH FROM observation_date)::INTEGER AS month, COUNT(*) AS observations
+            FROM {IMPORTED_TABLE}
+            GROUP BY EXTRACT(MONTH FROM observation_date)
+        ),
+        m AS (
+            SELECT :user_id AS user_id, month FROM touched
+            UNION
+            SELECT user_id, month FROM monthly_stats
+            WHERE user_id = :user_id AND year = :year
+            AND month >= (SELECT MIN(month) FROM touched)
+        ),
+        {_MONTH_FIGURES.format(user_filter="AND user_id = :user_id")}
+        INSERT INTO monthly_stats (user_id, year, month, species_count, new_species_count, total_observations, calculated_at)
+        SELECT
+            m.user_id,
+            :year,
+            m.month,
+            {_MONTH_SPECIES_COUNT},
+            {_MONTH_NEW_SPECIES},
+            COALESCE(t.observations, 0),
+            NOW()
+        FROM m
+        LEFT JOIN touched t ON t.month = m.month
+        ON CONFLICT (user_id, year, month) DO UPDATE SET
+            species_count = EXCLUDED.species_count,
+            new_species_count = EXCLUDED.new_species_count,
+            total_observations = COALESCE(monthly_stats.total_observations, 0) + EXCLUDED.total_observations,
+            calculated_at = EXCLUDED.calculated_at
+    """), {"user_id": user_id, "year": year})
+
+
+def backfill_monthly_stats(db: Session, year: int):
+    """Rebuild every user's progress-chart rows for a year (one-time, used by migrations)"""
+    db.execute(text("DELETE FROM monthly_stats WHERE year = :year"), {"year": year})
+    db.execute(text(f"""
+        WITH m AS (
+            SELECT user_id, EXTRACT(MONTH FROM observation_date)::INTEGER AS month, COUNT(*) AS observations
+            FROM observations
+            WHERE observation_date >= make_date(:year, 1, 1)
+            AND observation_date < make_date(:year + 1, 1, 1)
+            GROUP BY user_id, EXTRACT(MONTH FROM observation_date)
+        ),
+        {_MONTH_FIGURES.format(user_filter="")}
+        INSERT INTO monthly_stats (user_id, year, month, species_count, new_species_count, total_observations, calculated_at)
+        SELECT
+            m.user_id,
+            :year,
+            m.month,
+            {_MONTH_SPECIES_COUNT},
+            {_MONTH_NEW_SPECIES},
+            m.observations,
+            NOW()
+        FROM m
+    """), {"year": year})
+
+
+def backfill_user_year_species(db: Session, year: int):
+    """Build year lists for every user from existing observations (one-time, used by migrations)"""
+    db.execute(text("""
+        INSERT INTO user_year_species (
+            user_id, year, scientific_name, common_name, first_observation_date, state_province, countable
+        )
+        SELECT DISTINCT ON (user_id, scientific_name)
+            user_id, :year, scientific_name, common_name, observation_date, state_province, countable
+        FROM observations
+        WHERE observation_date >= make_date(:year, 1, 1)
+        AND observation_date < make_date(:year + 1, 1, 1)
+        ORDER BY user_id, scientific_name, observation_date ASC
+        ON CONFLICT (user_id, year, scientific_name) DO NOTHING
+    """), {"year": year})
+
+
+def backfill_countable(db: Session):
+    """Flag uncountable rows imported before countability was stored (one-time, used by migrations)"""
+    db.execute(text(f"UPDATE observations SET countable = FALSE WHERE NOT ({COUNTABLE_NAME_SQL})"))
+    db.execute(text(f"UPDATE user_year_species SET countable = FALSE WHERE NOT ({COUNTABLE_NAME_SQL})"))
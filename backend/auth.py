@@ -1,19 +1,24 @@
 """
 Authentication utilities for magic link login and JWT tokens
 """
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from secrets import token_urlsafe
 import os
 import resend
 
-from database import get_db
+from database import get_async_db
 from models import User
+from aggregates import refresh_user_year_summary
+from cache import invalidate_leaderboard, invalidate_user, user_cache
+from leaderboard_events import notify_leaderboard_change
 
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
@@ -47,6 +52,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def user_token_claims(user: User) -> dict:
+    """Identity and privacy claims carried in access tokens"""
+    return {
+        "user_id": user.id,
+        "email": user.email,
+        "name": user.name,
+        "privacy_level": user.privacy_level
+    }
+
 def verify_token(token: str) -> dict:
     """Verify and decode JWT token"""
     try:
@@ -59,13 +73,23 @@ def verify_token(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current user from JWT token"""
-    token = credentials.credentials
-    payload = verify_token(token)
+@dataclass(frozen=True)
+class TokenIdentity:
+    """
+    Caller identity read from the access token alone.
+    name and privacy_level are as of login (None in older tokens);
+    endpoints that need the current profile use get_current_user.
+    """
+    id: int
+    email: str
+    name: Optional[str] = None
+    privacy_level: Optional[str] = None
+
+def get_token_identity(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> TokenIdentity:
+    """Get the caller's identity from JWT claims without a database lookup"""
+    payload = verify_token(credentials.credentials)
     user_id: int = payload.get("user_id")
 
     if user_id is None:
@@ -74,13 +98,48 @@ def get_current_user(
             detail="Invalid authentication credentials"
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    return TokenIdentity(
+        id=user_id,
+        email=payload.get("email"),
+        name=payload.get("name"),
+        privacy_level=payload.get("privacy_level")
+    )
+
+async def get_current_user(
+    identity: TokenIdentity = Depends(get_token_identity),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    Get current user from JWT token.
+    Rows are cached for USER_CACHE_TTL seconds and returned detached, so treat
+    them as read-only; updates must load the row in the request's session.
+    """
+    user = user_cache.get(identity.id)
+    if user is not None:
+        return user
+
+    user = await db.get(User, identity.id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
 
+    db.expunge(user)
+    user_cache.set(identity.id, user)
+    return user
+
+async def get_current_user_for_update(
+    identity: TokenIdentity = Depends(get_token_identity),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Load the current user into the request's session, bypassing the cache, for handlers that modify it"""
+    user = await db.get(User, identity.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
     return user
 
 def send_magic_link_email(email: str, token: str):
@@ -189,32 +248,37 @@ def send_feature_request_email(suggestion: str, user_email: Optional[str] = None
         return True
 
 
-def create_magic_link(email: str, db: Session) -> tuple[User, str]:
+async def create_magic_link(email: str, db: AsyncSession) -> tuple[User, str]:
     """
     Create or get user and generate magic link token
     Returns (user, token)
     """
     # Get or create user
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).filter(User.email == email))).scalars().first()
     if not user:
         # Extract name from email (before @)
         default_name = email.split('@')[0].title()
         user = User(email=email, name=default_name)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.flush()
+        # New participants appear on the leaderboard with zero species
+        await db.run_sync(refresh_user_year_summary, user.id, 2026)
+        await db.run_sync(notify_leaderboard_change, user.id, 2026, "joined")
+        await db.commit()
+        invalidate_leaderboard()
+        await db.refresh(user)
 
     # Generate and store magic link token
     token = generate_magic_link_token()
     user.magic_link_token = token
     user.magic_link_expires = datetime.utcnow() + timedelta(minutes=MAGIC_LINK_EXPIRE_MINUTES)
-    db.commit()
+    await db.commit()
 
     return user, token
 
-def verify_magic_link(token: str, db: Session) -> Optional[User]:
+async def verify_magic_link(token: str, db: AsyncSession) -> Optional[User]:
     """Verify magic link token and return user if valid"""
-    user = db.query(User).filter(User.magic_link_token == token).first()
+    user = (await db.execute(select(User).filter(User.magic_link_token == token))).scalars().first()
 
     if not user:
         return None
@@ -227,6 +291,7 @@ def verify_magic_link(token: str, db: Session) -> Optional[User]:
     user.magic_link_token = None
     user.magic_link_expires = None
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    invalidate_user(user.id)
 
     return user
@@ -0,0 +1,85 @@
+"""
+Load test: concurrent request throughput against a running API server.
+
+Fires --requests GETs at the given paths with --concurrency requests in
+flight and reports throughput and latency percentiles. Point it at an
+uncached, DB-bound endpoint (e.g. /leaderboard/{user_id}/species) to see
+whether one worker serves queries concurrently or one at a time.
+
+Requires httpx (pip install httpx).
+
+Usage: python benchmarks/api_load.py [--url http://localhost:8000]
+           [--path /leaderboard/1/species ...] [--token JWT]
+           [--concurrency 50] [--requests 2000]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(url: str, paths: list, token: str, concurrency: int, total: int, timeout: float) -> dict:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(paths[i % len(paths)])
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "paths": paths,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(total / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 2) if latencies else None,
+            **{f"p{pct}": round(percentile(latencies, pct), 2) if latencies else None for pct in (50, 95, 99)},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", dest="paths", help="path to request (repeatable)")
+    parser.add_argument("--token", help="JWT for authenticated endpoints")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(
+        args.url, args.paths or ["/leaderboard/1/species"], args.token, args.concurrency, args.requests, args.timeout
+    ))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
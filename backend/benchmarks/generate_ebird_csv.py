@@ -0,0 +1,218 @@
+"""
+Synthetic eBird "My Data" CSV generator for benchmarks.
+
+Produces one observer's export: checklists (unique submission IDs) along a
+multi-state trip through the year, each listing distinct species drawn from
+a long-tailed (Zipf-like) species mix that includes uncountable taxa
+(spuhs, slashes, hybrids, domestics), "X" counts, missing counties and a
+share of rows from the previous year, as real exports contain every year.
+Output is deterministic for a given seed and observer index.
+
+Usage: python benchmarks/generate_ebird_csv.py --rows 100000 [--year 2026]
+           [--seed 1] [--observer 0] [--species 700] [--output data.csv]
+"""
+import argparse
+import csv
+import random
+import sys
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Iterator, List, TextIO, Tuple
+
+COLUMNS = [
+    "Submission ID", "Common Name", "Scientific Name", "Taxonomic Order", "Count",
+    "State/Province", "County", "Location ID", "Location", "Latitude", "Longitude",
+    "Date", "Time", "Protocol", "Duration (Min)", "All Obs Reported",
+    "Distance Traveled (km)", "Area Covered (ha)", "Number of Observers",
+    "Breeding Code", "Observation Details", "Checklist Comments", "ML Catalog Numbers",
+]
+
+# Common North American species, most frequently reported first
+COMMON_SPECIES = [
+    ("American Robin", "Turdus migratorius"),
+    ("Mourning Dove", "Zenaida macroura"),
+    ("American Crow", "Corvus brachyrhynchos"),
+    ("Northern Cardinal", "Cardinalis cardinalis"),
+    ("Red-winged Blackbird", "Agelaius phoeniceus"),
+    ("European Starling", "Sturnus vulgaris"),
+    ("House Sparrow", "Passer domesticus"),
+    ("Mallard", "Anas platyrhynchos"),
+    ("Canada Goose", "Branta canadensis"),
+    ("Song Sparrow", "Melospiza melodia"),
+    ("House Finch", "Haemorhous mexicanus"),
+    ("Turkey Vulture", "Cathartes aura"),
+    ("Red-tailed Hawk", "Buteo jamaicensis"),
+    ("Great Blue Heron", "Ardea herodias"),
+    ("Killdeer", "Charadrius vociferus"),
+    ("Common Raven", "Corvus corax"),
+    ("Rock Pigeon", "Columba livia"),
+    ("Blue Jay", "Cyanocitta cristata"),
+    ("Downy Woodpecker", "Dryobates pubescens"),
+    ("Northern Mockingbird", "Mimus polyglottos"),
+    ("American Goldfinch", "Spinus tristis"),
+    ("Dark-eyed Junco", "Junco hyemalis"),
+    ("Yellow-rumped Warbler", "Setophaga coronata"),
+    ("Black-capped Chickadee", "Poecile atricapillus"),
+    ("Tree Swallow", "Tachycineta bicolor"),
+    ("Barn Swallow", "Hirundo rustica"),
+    ("Great Egret", "Ardea alba"),
+    ("Double-crested Cormorant", "Nannopterum auritum"),
+    ("Ring-billed Gull", "Larus delawarensis"),
+    ("Bald Eagle", "Haliaeetus leucocephalus"),
+    ("Osprey", "Pandion haliaetus"),
+    ("Gadwall", "Mareca strepera"),
+    ("American Coot", "Fulica americana"),
+    ("Anna's Hummingbird", "Calypte anna"),
+    ("Western Meadowlark", "Sturnella neglecta"),
+    ("Cactus Wren", "Campylorhynchus brunneicapillus"),
+    ("Gambel's Quail", "Callipepla gambelii"),
+    ("Sora", "Porzana carolina"),
+    ("Snowy Egret", "Egretta thula"),
+    ("Sandhill Crane", "Antigone canadensis"),
+]
+
+# Taxa that do not count toward a year list
+UNCOUNTABLE_SPECIES = [
+    ("duck sp.", "Anatinae sp."),
+    ("gull sp.", "Larinae sp."),
+    ("Empidonax sp.", "Empidonax sp."),
+    ("Greater/Lesser Scaup", "Aythya marila/affinis"),
+    ("Downy/Hairy Woodpecker", "Dryobates pubescens/villosus"),
+    ("Mallard x American Black Duck (hybrid)", "Anas platyrhynchos x rubripes"),
+    ("Mallard (Domestic type)", "Anas platyrhynchos (Domestic type)"),
+    ("Cackling/Canada Goose", "Branta hutchinsii/canadensis"),
+]
+
+# (state, counties, centre latitude, centre longitude) along the trip
+STATES = [
+    ("US-AZ", ["Maricopa", "Pima", "Cochise", "Santa Cruz"], 33.4, -112.0),
+    ("US-NM", ["Dona Ana", "Grant", "Sierra"], 32.3, -106.8),
+    ("US-TX", ["Hidalgo", "Cameron", "Brewster", "Travis"], 26.2, -98.2),
+    ("US-LA", ["Cameron", "Vermilion"], 29.8, -93.3),
+    ("US-FL", ["Monroe", "Miami-Dade", "Collier", "Brevard"], 25.5, -80.6),
+    ("US-GA", ["Chatham", "Glynn"], 32.0, -81.1),
+    ("US-NC", ["Dare", "Hyde"], 35.5, -75.6),
+    ("US-VA", ["Accomack", "Northampton"], 37.7, -75.6),
+    ("US-OH", ["Ottawa", "Lucas"], 41.6, -83.2),
+    ("US-MI", ["Chippewa", "Berrien"], 46.4, -84.4),
+    ("US-MN", ["Lake", "St. Louis"], 47.5, -91.3),
+    ("US-MT", ["Glacier", "Flathead"], 48.7, -113.7),
+    ("US-WA", ["Clallam", "Grays Harbor"], 48.1, -123.4),
+    ("US-OR", ["Lane", "Harney"], 44.0, -123.1),
+    ("US-CA", ["San Diego", "Monterey", "Inyo", "Humboldt"], 32.7, -117.2),
+]
+
+PROTOCOLS = [
+    ("eBird - Traveling Count", 0.55),
+    ("eBird - Stationary Count", 0.3),
+    ("Incidental", 0.15),
+]
+
+
+def species_pool(total: int) -> List[Tuple[str, str]]:
+    """The species mix: common species, synthetic rarer ones up to total, then uncountable taxa"""
+    pool = list(COMMON_SPECIES)
+    for n in range(max(0, total - len(COMMON_SPECIES) - len(UNCOUNTABLE_SPECIES))):
+        pool.append((f"Synthetic Bird {n + 1}", f"Avis synthetica{n + 1}"))
+    # Uncountables are spread through the mix rather than all rare
+    for offset, taxon in enumerate(UNCOUNTABLE_SPECIES):
+        pool.insert(min(len(pool), 5 + offset * 12), taxon)
+    return pool
+
+
+def _trip_legs(rng: random.Random, year: int) -> List[Tuple[date, int]]:
+    """Start date and STATES index of each leg of the year's trip (1-6 weeks per state)"""
+    legs = []
+    day = date(year, 1, 1)
+    state = rng.randrange(len(STATES))
+    while day.year == year:
+        legs.append((day, state))
+        day += timedelta(days=rng.randint(7, 42))
+        state = (state + rng.choice((-1, 1, 1, 2))) % len(STATES)
+    return legs
+
+
+def generate_rows(rows: int, year: int = 2026, seed: int = 1, observer: int = 0,
+                  species: int = 700, previous_year_share: float = 0.1) -> Iterator[list]:
+    """Yield about rows CSV rows (whole checklists) for one observer"""
+    rng = random.Random(f"{seed}:{observer}")
+    pool = species_pool(species)
+    # Zipf-like weights: the k-th species is reported about 1/k as often as the first
+    cum_weights = list(accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(pool))))
+    indexes = range(len(pool))
+    protocols, protocol_weights = zip(*PROTOCOLS)
+
+    legs = {y: _trip_legs(rng, y) for y in (year - 1, year)}
+    produced = 0
+    submission = 0
+    while produced < rows:
+        checklist_year = year - 1 if rng.random() < previous_year_share else year
+        observed = date(checklist_year, 1, 1) + timedelta(days=rng.randrange(365))
+        state_index = next(index for start, index in reversed(legs[checklist_year]) if start <= observed)
+        state, counties, lat, lon = STATES[state_index]
+        county = rng.choice(counties) if rng.random() > 0.03 else ""
+        location = rng.randrange(40)
+        protocol = rng.choices(protocols, protocol_weights)[0]
+        size = min(rows - produced, 1 if protocol == "Incidental" else rng.randint(5, 45))
+
+        submission += 1
+        submission_id = f"S{observer:04d}{submission:07d}"
+        # Distinct species per checklist, as in real exports
+        chosen = set()
+        while len(chosen) < min(size, len(pool)):
+            chosen.update(rng.choices(indexes, cum_weights=cum_weights, k=size - len(chosen)))
+
+        hour = rng.randint(5, 18)
+        checklist = [
+            f"{state}-{location}", f"{county or counties[0]} {'Park' if location % 2 else 'Marsh'} #{location}",
+            round(lat + rng.uniform(-0.5, 0.5), 6), round(lon + rng.uniform(-0.5, 0.5), 6),
+            observed.isoformat(), f"{hour % 12 or 12:02d}:{rng.randrange(60):02d} {'AM' if hour < 12 else 'PM'}",
+            protocol,
+            rng.randint(5, 240) if protocol != "Incidental" else "",
+            1 if protocol != "Incidental" else 0,
+            round(rng.uniform(0.2, 8), 3) if protocol == "eBird - Traveling Count" else "",
+            "",
+            rng.choice((1, 1, 1, 2, 3)),
+        ]
+        for index in sorted(chosen):
+            common_name, scientific_name = pool[index]
+            count = "X" if rng.random() < 0.05 else rng.choice((1, 1, 2, 3, 5, 12, 40))
+            yield [
+                submission_id, common_name, scientific_name, 1000 + index * 10, count,
+                state, county, *checklist,
+                "", "", "", "",
+            ]
+        produced += len(chosen)
+
+
+def write_csv(out: TextIO, rows: int, **options) -> int:
+    """Write a header and rows to out; returns the number of data rows"""
+    writer = csv.writer(out)
+    writer.writerow(COLUMNS)
+    written = 0
+    for row in generate_rows(rows, **options):
+        writer.writerow(row)
+        written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--observer", type=int, default=0, help="observer index (distinct trips and submission IDs)")
+    parser.add_argument("--species", type=int, default=700, help="size of the species pool")
+    parser.add_argument("--output", help="CSV path (default: stdout)")
+    args = parser.parse_args()
+
+    options = {"year": args.year, "seed": args.seed, "observer": args.observer, "species": args.species}
+    if args.output:
+        with open(args.output, "w", newline="") as out:
+            write_csv(out, args.rows, **options)
+    else:
+        write_csv(sys.stdout, args.rows, **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Benchmark suite: importer and API hot paths on synthetic eBird data.
+
+Creates --users benchmark users (emails ending in @bench.invalid), generates
+one synthetic CSV each (generate_ebird_csv.py) and measures:
+
+- parse_ebird_csv: each user's file imported in this process, then one
+  file re-imported (every checklist unchanged); rows/s, per-import
+  latency and time per import phase
+- upload: --upload-users more files sent to POST /upload/csv of the server
+  at --url, timed until the job completes
+- /leaderboard, /leaderboard/{id}/species and /user/me/observations under
+  load (api_load.py), each reported separately
+
+Results are printed (or written to --output) as JSON, so runs can be diffed
+to catch regressions. The same --seed and sizes generate the same data.
+
+Needs the backend environment (DATABASE_URL; JWT_SECRET_KEY must match the
+server's) and, for the HTTP phases, a server running against the same
+database; --skip-http runs the parse_ebird_csv phase only. Benchmark users
+are deleted afterwards unless --keep, and before every run.
+
+Usage: python benchmarks/run_suite.py [--users 5] [--rows 50000]
+           [--upload-users 2] [--upload-rows 20000] [--url http://localhost:8000]
+           [--requests 1000] [--concurrency 20] [--seed 1] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import text
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from api_load import percentile, run as run_load  # noqa: E402
+from generate_ebird_csv import write_csv  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from csv_parser import parse_ebird_csv  # noqa: E402
+from database import SessionLocal  # noqa: E402
+from metrics import import_phase_duration  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from routers.upload import MAX_FILE_SIZE  # noqa: E402
+
+BENCH_EMAIL_DOMAIN = "bench.invalid"
+JOB_POLL_INTERVAL = 0.1
+
+
+def latency_summary(seconds: list) -> dict:
+    return {
+        "mean": round(statistics.mean(seconds), 3),
+        **{f"p{pct}": round(percentile(seconds, pct), 3) for pct in (50, 95, 99)},
+        "max": round(max(seconds), 3),
+    }
+
+
+def delete_bench_users(db) -> int:
+    deleted = db.execute(
+        text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": f"%@{BENCH_EMAIL_DOMAIN}"}
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+def create_bench_user(db, label: str) -> int:
+    user_id = db.execute(text("""
+        INSERT INTO users (email, name, privacy_level)
+        VALUES (:email, :name, 'public')
+        RETURNING id
+    """), {"email": f"{label}@{BENCH_EMAIL_DOMAIN}", "name": f"Bench {label}"}).scalar()
+    db.commit()
+    return user_id
+
+
+def generate_file(directory: str, label: str, rows: int, observer: int, args) -> str:
+    path = os.path.join(directory, f"{label}.csv")
+    with open(path, "w", newline="") as out:
+        write_csv(out, rows, year=args.year, seed=args.seed, observer=observer, species=args.species)
+    return path
+
+
+def bench_parse(paths: dict, year: int) -> dict:
+    """Import each user's file with parse_ebird_csv, then re-import the first one"""
+    phases_before = import_phase_duration.totals()
+    imports, latencies = [], []
+    started = time.perf_counter()
+    for user_id, path in paths.items():
+        db = SessionLocal()
+        try:
+            import_started = time.perf_counter()
+            stats = parse_ebird_csv(path, user_id, db, target_year=year)
+            latencies.append(time.perf_counter() - import_started)
+        finally:
+            db.close()
+        imports.append(stats)
+    elapsed = time.perf_counter() - started
+
+    phases = {}
+    for (phase,), (count, total) in import_phase_duration.totals().items():
+        count_before, total_before = phases_before.get((phase,), (0, 0.0))
+        phases[phase] = {"observations": count - count_before, "seconds": round(total - total_before, 3)}
+
+    user_id, path = next(iter(paths.items()))
+    db = SessionLocal()
+    try:
+        reimport_started = time.perf_counter()
+        reimport = parse_ebird_csv(path, user_id, db, target_year=year)
+        reimport_elapsed = time.perf_counter() - reimport_started
+    finally:
+        db.close()
+
+    rows = sum(stats["total_rows"] for stats in imports)
+    return {
+        "imports": len(imports),
+        "rows": rows,
+        "imported": sum(stats["imported"] for stats in imports),
+        "errors": sum(stats["errors"] for stats in imports),
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed, 1),
+        "import_latency_s": latency_summary(latencies),
+        "phase_seconds": phases,
+        "reimport": {
+            "rows": reimport["total_rows"],
+            "duplicates": reimport["duplicates"],
+            "unchanged": reimport["unchanged"],
+            "elapsed_s": round(reimport_elapsed, 2),
+            "rows_per_s": round(reimport["total_rows"] / reimport_elapsed, 1),
+        },
+    }
+
+
+async def bench_upload(url: str, uploads: dict, timeout: float) -> dict:
+    """Upload each file through POST /upload/csv and wait for its job to finish"""
+    latencies, accept_latencies, rows, failures = [], [], 0, []
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        started = time.perf_counter()
+        for user_id, path in uploads.items():
+            headers = {"Authorization": f"Bearer {bench_token(user_id)}"}
+            upload_started = time.perf_counter()
+            with open(path, "rb") as upload:
+                response = await client.post(
+                    "/upload/csv", headers=headers, files={"file": (os.path.basename(path), upload, "text/csv")}
+                )
+            response.raise_for_status()
+            accept_latencies.append(time.perf_counter() - upload_started)
+
+            job = response.json()
+            while job["status"] not in ("completed", "failed"):
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                job = (await client.get(f"/upload/jobs/{job['job_id']}", headers=headers)).json()
+            latencies.append(time.perf_counter() - upload_started)
+            if job["status"] == "failed":
+                failures.append(job["error"])
+            rows += job["rows_parsed"]
+        elapsed = time.perf_counter() - started
+
+    return {
+        "uploads": len(uploads),
+        "rows": rows,
+        "failed": failures,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed, 1),
+        "accepted_latency_s": latency_summary(accept_latencies),
+        "completed_latency_s": latency_summary(latencies),
+    }
+
+
+def bench_token(user_id: int) -> str:
+    return create_access_token({"user_id": user_id, "email": f"{user_id}@{BENCH_EMAIL_DOMAIN}"})
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=5, help="users imported with parse_ebird_csv")
+    parser.add_argument("--rows", type=int, default=50000, help="CSV rows per user (1k-1M)")
+    parser.add_argument("--upload-users", type=int, default=2, help="users imported through POST /upload/csv")
+    parser.add_argument("--upload-rows", type=int, default=20000, help="CSV rows per upload (must fit in 10MB)")
+    parser.add_argument("--species", type=int, default=700, help="size of the species pool")
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--skip-http", action="store_true", help="only benchmark parse_ebird_csv")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--output", help="JSON results path (default: stdout)")
+    parser.add_argument("--keep", action="store_true", help="keep benchmark users and their data")
+    args = parser.parse_args()
+
+    run_migrations()
+    db = SessionLocal()
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": {},
+    }
+
+    try:
+        delete_bench_users(db)
+        with tempfile.TemporaryDirectory(prefix="bench-ebird-") as directory:
+            paths = {}
+            for i in range(args.users):
+                label = f"parse-{i}"
+                paths[create_bench_user(db, label)] = generate_file(directory, label, args.rows, i, args)
+            results["results"]["parse_ebird_csv"] = bench_parse(paths, args.year)
+
+            if not args.skip_http:
+                uploads = {}
+                for i in range(args.upload_users):
+                    label = f"upload-{i}"
+                    path = generate_file(directory, label, args.upload_rows, args.users + i, args)
+                    if os.path.getsize(path) > MAX_FILE_SIZE:
+                        parser.error(f"--upload-rows {args.upload_rows} makes files larger than the upload limit")
+                    uploads[create_bench_user(db, label)] = path
+                results["results"]["upload"] = asyncio.run(bench_upload(args.url, uploads, args.timeout))
+
+        if not args.skip_http:
+            user_ids = list(paths)
+            token = bench_token(user_ids[0])
+            endpoints = {
+                "leaderboard": [f"/leaderboard?year={args.year}"],
+                "leaderboard_species": [f"/leaderboard/{user_id}/species?year={args.year}" for user_id in user_ids],
+                "user_observations": [f"/user/me/observations?year={args.year}"],
+            }
+            for name, endpoint_paths in endpoints.items():
+                results["results"][name] = asyncio.run(run_load(
+                    args.url, endpoint_paths, token, args.concurrency, args.requests, args.timeout
+                ))
+    finally:
+        db.rollback()
+        if not args.keep:
+            delete_bench_users(db)
+        db.close()
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
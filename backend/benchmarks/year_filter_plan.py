@@ -0,0 +1,119 @@
+"""
+Benchmark: EXTRACT(YEAR ...) vs date-range year filters on observations.
+
+Builds a scratch copy of the observations indexes, fills it with synthetic
+rows spread over several years and many users, then EXPLAIN ANALYZEs the
+per-user and all-user year queries with both predicates. The EXTRACT form
+cannot use (user_id, observation_date) / (observation_date) for the year,
+so it reads every row of the user (or the whole table); the range form
+scans only the requested year.
+
+Usage: python benchmarks/year_filter_plan.py [--rows 10000000] [--keep]
+"""
+import argparse
+import json
+import os
+import time
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+if not DATABASE_URL:
+    raise ValueError("DATABASE_URL environment variable is not set")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+TABLE = "bench_year_filter"
+YEARS = 7          # 2020..2026
+USERS = 2000
+YEAR = 2026
+
+PREDICATES = {
+    "extract": "EXTRACT(YEAR FROM observation_date) = :year",
+    "date_range": "observation_date >= make_date(:year, 1, 1) AND observation_date < make_date(:year + 1, 1, 1)",
+}
+
+QUERIES = {
+    "user_year_species": "SELECT COUNT(DISTINCT scientific_name) FROM {table} WHERE user_id = :user_id AND {predicate}",
+    "year_observations": "SELECT COUNT(*) FROM {table} WHERE {predicate}",
+}
+
+
+def build_table(conn, rows: int):
+    """Create and fill the scratch table with the same indexes as observations"""
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    conn.execute(text(f"""
+        CREATE UNLOGGED TABLE {TABLE} (
+            id BIGINT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            scientific_name VARCHAR(255) NOT NULL,
+            observation_date DATE NOT NULL
+        )
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {TABLE}
+        SELECT
+            i,
+            (i % {USERS}) + 1,
+            'Species ' || (i % 900),
+            DATE '2020-01-01' + ((i / {USERS}) % ({YEARS} * 365))::INTEGER
+        FROM generate_series(1, :rows) AS i
+    """), {"rows": rows})
+    conn.execute(text(f"CREATE INDEX {TABLE}_user_date ON {TABLE}(user_id, observation_date)"))
+    conn.execute(text(f"CREATE INDEX {TABLE}_date ON {TABLE}(observation_date)"))
+    conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+def scan_nodes(plan: dict) -> list:
+    """Collect '<node type> on <relation/index>' for every scan in a plan tree"""
+    nodes = []
+    if "Scan" in plan["Node Type"]:
+        target = plan.get("Index Name") or plan.get("Relation Name")
+        nodes.append(f"{plan['Node Type']} on {target}")
+    for child in plan.get("Plans", []):
+        nodes.extend(scan_nodes(child))
+    return nodes
+
+
+def explain(conn, sql: str, params: dict) -> dict:
+    result = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params).scalar()
+    root = result[0] if isinstance(result, list) else json.loads(result)[0]
+    return {
+        "scans": scan_nodes(root["Plan"]),
+        "execution_ms": round(root["Execution Time"], 2),
+        "shared_buffers": root["Plan"].get("Shared Hit Blocks", 0) + root["Plan"].get("Shared Read Blocks", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch table afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        build_table(conn, args.rows)
+        conn.commit()
+        print(f"Built {TABLE} with {args.rows:,} rows in {time.perf_counter() - started:.1f}s\n")
+
+        results = {"rows": args.rows, "queries": {}}
+        params = {"user_id": 42, "year": YEAR}
+        for query_name, query in QUERIES.items():
+            results["queries"][query_name] = {}
+            for predicate_name, predicate in PREDICATES.items():
+                sql = query.format(table=TABLE, predicate=predicate)
+                results["queries"][query_name][predicate_name] = plan = explain(conn, sql, params)
+                print(f"{query_name:<20} {predicate_name:<11} {plan['execution_ms']:>10.2f} ms  "
+                      f"{plan['shared_buffers']:>8} buffers  {', '.join(plan['scans'])}")
+
+        if not args.keep:
+            conn.execute(text(f"DROP TABLE {TABLE}"))
+            conn.commit()
+
+    print()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+In-process response caching
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+import os
+import time
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl seconds.
+    Each worker process has its own copy, so ttl bounds how stale another
+    worker can be after an explicit invalidation here.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key matches predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+
+# Serialized GET /leaderboard responses keyed by query parameters
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", 30))
+leaderboard_cache = TTLCache(maxsize=64, ttl=LEADERBOARD_CACHE_TTL)
+
+
+def invalidate_leaderboard():
+    """Drop cached leaderboards after an import or profile change commits"""
+    leaderboard_cache.clear()
+
+
+# User rows for authenticated requests, keyed by user id
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+user_cache = TTLCache(maxsize=1024, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(user_id: int):
+    """Drop a cached user row after the row is updated"""
+    user_cache.delete(user_id)
+
+
+# Profile statistics keyed by (user_id, year); only imports change them
+USER_STATS_CACHE_TTL = float(os.getenv("USER_STATS_CACHE_TTL", 300))
+user_stats_cache = TTLCache(maxsize=1024, ttl=USER_STATS_CACHE_TTL)
+
+
+def invalidate_user_stats(user_id: int, year: int):
+    """Drop cached profile statistics after an import for that user commits"""
+    user_stats_cache.delete((user_id, year))
+
+
+# Species comparisons keyed by (year, user1_id, user2_id)
+COMPARE_CACHE_TTL = float(os.getenv("COMPARE_CACHE_TTL", 300))
+compare_cache = TTLCache(maxsize=512, ttl=COMPARE_CACHE_TTL)
+
+
+def invalidate_comparisons(user_id: int, year: Optional[int] = None):
+    """Drop cached comparisons involving a user, for one year or all years"""
+    compare_cache.invalidate_where(
+        lambda key: user_id in key[1:] and (year is None or key[0] == year)
+    )
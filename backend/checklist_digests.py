@@ -0,0 +1,81 @@
+"""
+Per-checklist digests of imported CSV rows.
+
+Members re-upload their whole eBird export, usually with only a few new or
+edited checklists. Each import stores a digest of every checklist's rows;
+the next import skips checklists whose rows hash the same and only parses
+and inserts the rest.
+
+A digest is the sum (mod 2**64) of per-row hashes plus the row count, so
+it does not depend on row order or on where the CSV was split into chunks.
+Rows are hashed as read (all columns as text), so any edit to a checklist
+in eBird changes its digest. A false "changed" only costs a redundant
+insert, which ON CONFLICT skips; a stale digest could hide rows, so digests
+are written in the same transaction as the observations they describe, and
+only for checklists whose rows were all stored as in the file.
+"""
+from typing import Dict, Iterable, Set, Tuple
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# submission_id -> (digest, row count)
+Digests = Dict[str, Tuple[int, int]]
+
+_MASK = 2 ** 64 - 1
+
+
+def _signed(value: int) -> int:
+    """Fold an unsigned 64-bit sum into BIGINT range"""
+    return value - 2 ** 64 if value >= 2 ** 63 else value
+
+
+def submission_ids(df: pd.DataFrame) -> pd.Series:
+    return df['Submission ID'].astype(str).str.strip()
+
+
+def add_chunk_digests(digests: Digests, df: pd.DataFrame):
+    """Fold a chunk of raw CSV rows (read as text) into digests"""
+    if df.empty:
+        return
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    per_checklist = hashes.groupby(submission_ids(df).values).agg(['sum', 'count'])
+    for submission_id, row_sum, rows in per_checklist.itertuples():
+        digest, count = digests.get(submission_id, (0, 0))
+        digests[submission_id] = ((digest + int(row_sum)) & _MASK, count + int(rows))
+
+
+def changed_checklists(db: Session, user_id: int, digests: Digests) -> Set[str]:
+    """Submission IDs that are new for this user or whose rows changed since the last import"""
+    stored = {
+        row.submission_id: (row.digest, row.row_count)
+        for row in db.execute(text("""
+            SELECT submission_id, digest, row_count FROM checklist_digests WHERE user_id = :user_id
+        """), {"user_id": user_id})
+    }
+    return {
+        submission_id for submission_id, (digest, rows) in digests.items()
+        if stored.get(submission_id) != (_signed(digest), rows)
+    }
+
+
+def store_checklist_digests(db: Session, user_id: int, digests: Digests, checklists: Iterable[str]):
+    """Upsert the digests of the given checklists (in the caller's transaction)"""
+    ids = sorted(checklists)
+    if not ids:
+        return
+    db.execute(text("""
+        INSERT INTO checklist_digests (user_id, submission_id, digest, row_count)
+        SELECT :user_id, submission_id, digest, row_count
+        FROM unnest(CAST(:ids AS TEXT[]), CAST(:digests AS BIGINT[]), CAST(:row_counts AS INTEGER[]))
+            AS d(submission_id, digest, row_count)
+        ON CONFLICT (user_id, submission_id) DO UPDATE SET
+            digest = EXCLUDED.digest,
+            row_count = EXCLUDED.row_count,
+            updated_at = NOW()
+    """), {
+        "user_id": user_id,
+        "ids": ids,
+        "digests": [_signed(digests[submission_id][0]) for submission_id in ids],
+        "row_counts": [digests[submission_id][1] for submission_id in ids],
+    })
@@ -1,33 +1,205 @@
 """
 eBird CSV parsing and import logic
 """
-from datetime import datetime
-from typing import Dict
+from datetime import date
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 import pandas as pd
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
-from sqlalchemy import text
-from models import Observation
+from aggregates import apply_imported_observations
+from checklist_digests import Digests, add_chunk_digests, changed_checklists, store_checklist_digests, submission_ids
+from taxonomy import countable_mask
+from partitions import ensure_observation_partition
+from metrics import phase_timer, timed_iter
+from observation_loader import (
+    OBSERVATION_COLUMNS,
+    create_staging_table,
+    copy_to_staging,
+    merge_staging,
+    staged_checklists,
+    update_staged_details
+)
+
+_SCIENTIFIC_NAME = OBSERVATION_COLUMNS.index("scientific_name")
+
+# Rows per DataFrame when streaming the CSV
+CHUNK_ROWS = 20000
+
+# Columns every chunk must have
+REQUIRED_COLUMNS = ["Submission ID", "Common Name", "Scientific Name", "Date", "State/Province"]
+
+# Errors from pandas that mean the upload is not a readable CSV
+CSV_READ_ERRORS = (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError)
+
+# eBird text columns -> observation fields (trimmed, NaN becomes None)
+TEXT_COLUMNS = {
+    "state_province": "State/Province",
+    "county": "County",
+    "location_id": "Location ID",
+    "location": "Location",
+    "protocol": "Protocol",
+    "breeding_code": "Breeding Code",
+    "observation_details": "Observation Details",
+    "checklist_comments": "Checklist Comments",
+    "ml_catalog_numbers": "ML Catalog Numbers",
+}
+
+# eBird numeric columns -> observation fields with their Python type
+NUMERIC_COLUMNS = {
+    "taxonomic_order": ("Taxonomic Order", int),
+    "latitude": ("Latitude", float),
+    "longitude": ("Longitude", float),
+    "duration_min": ("Duration (Min)", int),
+    "distance_traveled_km": ("Distance Traveled (km)", float),
+    "area_covered_ha": ("Area Covered (ha)", float),
+    "num_observers": ("Number of Observers", int),
+}
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Return a CSV column, or an all-missing column if the export lacks it"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def _to_python(series: pd.Series) -> list:
+    """Convert a column to a list of native Python values with None for missing"""
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def _text_values(series: pd.Series, strip: bool = True) -> pd.Series:
+    """Cast a column to trimmed strings, keeping missing values missing"""
+    values = series.astype(object).where(series.notna(), None)
+    present = values.notna()
+    as_text = values[present].astype(str)
+    if strip:
+        as_text = as_text.str.strip()
+    values[present] = as_text
+    return values
+
+
+def _parse_times(series: pd.Series) -> pd.Series:
+    """Parse eBird time format '02:33 PM' to Python time objects (None if unparseable)"""
+    parsed = pd.to_datetime(series.astype(object).where(series.notna(), None),
+                            format='%I:%M %p', errors='coerce')
+    return parsed.dt.time.astype(object).where(parsed.notna(), None)
+
 
-def parse_time(time_str: str):
-    """Parse eBird time format '02:33 PM' to Python time object"""
-    if not time_str or pd.isna(time_str):
-        return None
+def transform_observations(df: pd.DataFrame, user_id: int) -> Tuple[List[tuple], int]:
+    """
+    Convert a date-parsed eBird DataFrame into observation records.
+
+    All trimming, NaN-to-None conversion, type casting and time parsing is
+    done column-wise. Rows whose numeric fields cannot be cast are dropped
+    and counted as errors, matching the old row-by-row import.
+
+    Returns:
+        (records, errors) where records are tuples in OBSERVATION_COLUMNS order
+    """
+    columns = {}
+    invalid = pd.Series(False, index=df.index)
+
+    for field, (source, cast) in NUMERIC_COLUMNS.items():
+        raw = _column(df, source)
+        numeric = pd.to_numeric(raw, errors='coerce')
+        invalid |= raw.notna() & numeric.isna()
+        if cast is int:
+            # int() truncates, e.g. a 10.5 minute duration is stored as 10
+            numeric = numeric.where(numeric.isna(), numeric // 1).astype('Int64')
+        columns[field] = numeric
+
+    valid = ~invalid
+    errors = int(invalid.sum())
+    df = df[valid]
+
+    columns = {field: values[valid] for field, values in columns.items()}
+    columns["submission_id"] = df['Submission ID'].astype(str).str.strip()
+    columns["common_name"] = df['Common Name'].astype(str).str.strip()
+    columns["countable"] = countable_mask(columns["common_name"])
+    columns["scientific_name"] = df['Scientific Name'].astype(str).str.strip()
+    columns["count"] = _text_values(_column(df, 'Count'), strip=False)
+    for field, source in TEXT_COLUMNS.items():
+        columns[field] = _text_values(_column(df, source))
+
+    all_obs = _column(df, 'All Obs Reported')
+    columns["all_obs_reported"] = all_obs.astype(object).where(all_obs.notna(), False).astype(bool)
+    columns["observation_date"] = df['Date'].dt.date
+    columns["observation_time"] = _parse_times(_column(df, 'Time'))
+    columns["user_id"] = pd.Series(user_id, index=df.index)
+
+    records = list(zip(*(_to_python(columns[field]) for field in OBSERVATION_COLUMNS)))
+    return records, errors
+
+
+def _read_chunks(source: Union[str, BinaryIO], as_text: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Read the CSV in CHUNK_ROWS-sized DataFrames so memory stays bounded.
+    as_text keeps every column as the text in the file (no type inference).
+    """
+    if not isinstance(source, str):
+        source.seek(0)
     try:
-        return datetime.strptime(str(time_str), '%I:%M %p').time()
-    except:
-        return None
+        reader = pd.read_csv(source, encoding='utf-8', chunksize=CHUNK_ROWS, dtype=str if as_text else None)
+        for chunk in reader:
+            yield chunk
+    except CSV_READ_ERRORS as e:
+        raise ValueError(f"Failed to read CSV file: {e}")
+
 
-def parse_ebird_csv(file_path: str, user_id: int, db_session: Session, target_year: int = 2026) -> Dict:
+def _parse_dates(df: pd.DataFrame) -> pd.Series:
+    """Check a chunk has the required columns and parse its Date column"""
+    missing = set(REQUIRED_COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    try:
+        return pd.to_datetime(df['Date'])
+    except Exception as e:
+        raise ValueError(f"Failed to parse dates: {e}")
+
+
+def _stored_species(db_session: Session, user_id: int, checklists: Iterable[str], year: int) -> Set[str]:
+    """Scientific names this user has stored for the given checklists in year"""
+    return set(db_session.execute(text("""
+        SELECT DISTINCT scientific_name FROM observations
+        WHERE user_id = :user_id
+          AND submission_id = ANY(:checklists)
+          AND observation_date >= :start AND observation_date < :end
+    """), {
+        "user_id": user_id,
+        "checklists": sorted(checklists),
+        "start": date(year, 1, 1),
+        "end": date(year + 1, 1, 1),
+    }).scalars())
+
+
+def parse_ebird_csv(
+    source: Union[str, BinaryIO],
+    user_id: int,
+    db_session: Session,
+    target_year: int = 2026,
+    progress: Optional[Callable[[Dict], None]] = None
+) -> Dict:
     """
     Parse eBird CSV and import observations to database.
 
+    The file is read twice, chunk by chunk. The first pass digests each
+    target-year checklist (see checklist_digests); the second transforms and
+    copies only the checklists that are new or changed since this user's
+    last import. All of them are merged into observations in one
+    transaction at the end: new rows are inserted and edited details of
+    stored rows updated. A checklist's digest is only stored once every
+    one of its rows is stored as in the file, so checklists with bad rows
+    or edits that could not be applied are parsed again next time.
+
     Args:
-        file_path: Path to CSV file
+        source: Path to CSV file or a seekable binary file object
         user_id: User ID who uploaded the file
         db_session: Database session
         target_year: Year to filter observations (default: 2026)
+        progress: Optional callback receiving the running stats after each chunk
 
     Returns:
         Dictionary with import statistics
@@ -35,143 +207,105 @@ def parse_ebird_csv(file_path: str, user_id: int, db_session: Session, target_ye
     stats = {
         "total_rows": 0,
         "imported": 0,
+        "updated": 0,
         "duplicates": 0,
+        "unchanged": 0,
         "errors": 0,
         "species_count": 0,
+        "checklists": 0,
+        "unchanged_checklists": 0,
         "date_range": {"earliest": None, "latest": None}
     }
 
-    # Read CSV with pandas
-    try:
-        df = pd.read_csv(file_path, encoding='utf-8')
-    except Exception as e:
-        raise ValueError(f"Failed to read CSV file: {e}")
-
-    # Validate required columns
-    required_columns = [
-        "Submission ID", "Common Name", "Scientific Name",
-        "Date", "State/Province"
-    ]
-    missing = set(required_columns) - set(df.columns)
-    if missing:
-        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    digests: Digests = {}
+    earliest = latest = None
 
-    stats["total_rows"] = len(df)
+    # First pass: digest every target-year checklist as it appears in the file
+    for df in timed_iter(_read_chunks(source, as_text=True), "read_csv"):
+        stats["total_rows"] += len(df)
+        if progress:
+            progress(stats)
 
-    # Parse date column
-    try:
-        df['Date'] = pd.to_datetime(df['Date'])
-    except Exception as e:
-        raise ValueError(f"Failed to parse dates: {e}")
+        with phase_timer("digest"):
+            dates = _parse_dates(df)
+            in_year = dates.dt.year == target_year
+            df_year = df[in_year]
+            add_chunk_digests(digests, df_year)
 
-    # Filter to target year observations only
-    df_filtered = df[df['Date'].dt.year == target_year].copy()
+        if len(df_year):
+            year_dates = dates[in_year]
+            earliest = year_dates.min() if earliest is None else min(earliest, year_dates.min())
+            latest = year_dates.max() if latest is None else max(latest, year_dates.max())
 
-    if len(df_filtered) == 0:
+    if not digests:
         return stats  # No observations for target year
 
-    # Track unique species
-    species_set = set()
-
-    # Batch insert for performance (10-100x faster than individual commits)
-    BATCH_SIZE = 100
-    observations_batch = []
-
-    for idx, row in df_filtered.iterrows():
-        try:
-            # Parse observation data
-            obs = Observation(
-                user_id=user_id,
-                submission_id=str(row['Submission ID']).strip(),
-                common_name=str(row['Common Name']).strip(),
-                scientific_name=str(row['Scientific Name']).strip(),
-                taxonomic_order=int(row['Taxonomic Order']) if pd.notna(row.get('Taxonomic Order')) else None,
-                count=str(row.get('Count', '')) if pd.notna(row.get('Count')) else None,
-                state_province=str(row.get('State/Province', '')).strip() if pd.notna(row.get('State/Province')) else None,
-                county=str(row.get('County', '')).strip() if pd.notna(row.get('County')) else None,
-                location_id=str(row.get('Location ID', '')).strip() if pd.notna(row.get('Location ID')) else None,
-                location=str(row.get('Location', '')).strip() if pd.notna(row.get('Location')) else None,
-                latitude=float(row['Latitude']) if pd.notna(row.get('Latitude')) else None,
-                longitude=float(row['Longitude']) if pd.notna(row.get('Longitude')) else None,
-                observation_date=row['Date'].date(),
-                observation_time=parse_time(row.get('Time')),
-                protocol=str(row.get('Protocol', '')).strip() if pd.notna(row.get('Protocol')) else None,
-                duration_min=int(row['Duration (Min)']) if pd.notna(row.get('Duration (Min)')) else None,
-                all_obs_reported=bool(row.get('All Obs Reported', False)) if pd.notna(row.get('All Obs Reported')) else False,
-                distance_traveled_km=float(row['Distance Traveled (km)']) if pd.notna(row.get('Distance Traveled (km)')) else None,
-                area_covered_ha=float(row['Area Covered (ha)']) if pd.notna(row.get('Area Covered (ha)')) else None,
-                num_observers=int(row['Number of Observers']) if pd.notna(row.get('Number of Observers')) else None,
-                breeding_code=str(row.get('Breeding Code', '')).strip() if pd.notna(row.get('Breeding Code')) else None,
-                observation_details=str(row.get('Observation Details', '')).strip() if pd.notna(row.get('Observation Details')) else None,
-                checklist_comments=str(row.get('Checklist Comments', '')).strip() if pd.notna(row.get('Checklist Comments')) else None,
-                ml_catalog_numbers=str(row.get('ML Catalog Numbers', '')).strip() if pd.notna(row.get('ML Catalog Numbers')) else None
-            )
-
-            observations_batch.append(obs)
-            species_set.add(row['Scientific Name'])
-
-            # Track date range
-            if not stats["date_range"]["earliest"] or row['Date'] < stats["date_range"]["earliest"]:
-                stats["date_range"]["earliest"] = row['Date'].strftime('%Y-%m-%d')
-            if not stats["date_range"]["latest"] or row['Date'] > stats["date_range"]["latest"]:
-                stats["date_range"]["latest"] = row['Date'].strftime('%Y-%m-%d')
-
-            # Batch insert when batch is full
-            if len(observations_batch) >= BATCH_SIZE:
-                try:
-                    db_session.bulk_save_objects(observations_batch)
-                    db_session.commit()
-                    stats["imported"] += len(observations_batch)
-                except IntegrityError:
-                    # Handle duplicates individually for this batch
-                    db_session.rollback()
-                    for ob in observations_batch:
-                        try:
-                            db_session.add(ob)
-                            db_session.commit()
-                            stats["imported"] += 1
-                        except IntegrityError:
-                            db_session.rollback()
-                            stats["duplicates"] += 1
-                observations_batch = []
-
-        except Exception as e:
-            stats["errors"] += 1
-            print(f"Error parsing row {idx}: {e}")
-
-    # Insert remaining observations
-    if observations_batch:
-        try:
-            db_session.bulk_save_objects(observations_batch)
-            db_session.commit()
-            stats["imported"] += len(observations_batch)
-        except IntegrityError:
-            # Handle duplicates individually for remaining batch
-            db_session.rollback()
-            for ob in observations_batch:
-                try:
-                    db_session.add(ob)
-                    db_session.commit()
-                    stats["imported"] += 1
-                except IntegrityError:
-                    db_session.rollback()
-                    stats["duplicates"] += 1
+    stats["checklists"] = len(digests)
+    stats["date_range"]["earliest"] = earliest.strftime('%Y-%m-%d')
+    stats["date_range"]["latest"] = latest.strftime('%Y-%m-%d')
+
+    changed = changed_checklists(db_session, user_id, digests)
+    unchanged = [submission_id for submission_id in digests if submission_id not in changed]
+    stats["unchanged_checklists"] = len(unchanged)
+    stats["unchanged"] = sum(digests[submission_id][1] for submission_id in unchanged)
+    # Species of skipped checklists are counted from their stored rows
+    species_set = _stored_species(db_session, user_id, unchanged, target_year) if unchanged else set()
+    staged = 0
+
+    if changed:
+        # Rows can only be inserted once their year's partition exists
+        ensure_observation_partition(db_session, target_year)
+        db_session.commit()
+
+        create_staging_table(db_session)
+
+        # Second pass: transform and stage the new and changed checklists only
+        for df in timed_iter(_read_chunks(source), "read_csv"):
+            if progress:
+                progress(stats)
+
+            with phase_timer("transform"):
+                df['Date'] = _parse_dates(df)
+                df_filtered = df[(df['Date'].dt.year == target_year) & submission_ids(df).isin(changed)]
+                if len(df_filtered) == 0:
+                    continue
+
+                # Columnar transform: one pass per column instead of per row
+                records, errors = transform_observations(df_filtered, user_id)
+            stats["errors"] += errors
+            if not records:
+                continue
+
+            species_set.update(record[_SCIENTIFIC_NAME] for record in records)
+            with phase_timer("insert"):
+                staged += copy_to_staging(db_session, records)
 
     stats["species_count"] = len(species_set)
 
-    # Refresh materialized views and recalculate stats
-    try:
-        db_session.execute(text("SELECT refresh_species_summary();"))
-        db_session.execute(
-            text("SELECT calculate_monthly_stats(:user_id, :year)"),
-            {"user_id": user_id, "year": target_year}
-        )
-        db_session.execute(
-            text("SELECT calculate_geographic_stats(:user_id)"),
-            {"user_id": user_id}
-        )
+    # One UPDATE and one INSERT ... ON CONFLICT for the whole file, in one transaction
+    if staged:
+        if progress:
+            progress(stats)
+        with phase_timer("insert"):
+            stats["updated"] = update_staged_details(db_session)
+            stats["imported"] = merge_staging(db_session)
+
+    # Fold the new rows into this user's aggregates in the same transaction
+    if stats["imported"]:
+        with phase_timer("stats_recompute"):
+            apply_imported_observations(db_session, user_id, target_year)
+
+    if staged:
+        merged = [
+            submission_id for submission_id, rows, all_stored in staged_checklists(db_session)
+            if all_stored and rows == digests[submission_id][1]
+        ]
+        store_checklist_digests(db_session, user_id, digests, merged)
+    with phase_timer("commit"):
         db_session.commit()
-    except Exception as e:
-        print(f"Error refreshing views: {e}")
+
+    stats["duplicates"] = staged - stats["imported"] - stats["updated"]
+    if progress:
+        progress(stats)
 
     return stats
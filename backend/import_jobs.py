@@ -0,0 +1,260 @@
+"""
+Background CSV import jobs.
+
+Uploads are spooled to disk, recorded in the import_jobs table and run
+on a local thread pool. Job state lives in Postgres so any worker process
+can answer GET /upload/jobs/{id}; no external broker is involved.
+
+Each job records the process that queued it (WORKER_ID). That process
+holds a session advisory lock on its id for as long as it runs, and
+Postgres releases it when the connection closes, even if the process is
+killed. A starting process fails the unfinished jobs of every owner whose
+lock is free.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from threading import Lock
+from typing import BinaryIO, Dict, Optional, Tuple
+import hashlib
+import os
+import tempfile
+import uuid
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+from models import ImportJob
+from cache import invalidate_comparisons, invalidate_leaderboard, invalidate_user_stats
+from csv_parser import parse_ebird_csv
+from metrics import current_endpoint
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 2))
+
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+# Jobs without a progress update for this long are considered abandoned
+STALE_JOB_AFTER = timedelta(minutes=30)
+
+INTERRUPTED_ERROR = "Import was interrupted. Please upload the file again."
+
+# Owner id stored on the jobs this process queues, and its advisory lock key
+WORKER_ID = uuid.uuid4().hex
+WORKER_LOCK = "hashtext('import_workers'), hashtext(:worker_id)"
+
+# Connection holding this process's worker lock, open from startup to shutdown
+_owner_connection: Optional[Connection] = None
+
+# Submitted jobs not yet finished -> (job id, spool path), failed on shutdown if never started
+_pending: Dict[Future, Tuple[int, str]] = {}
+_pending_lock = Lock()
+
+# Queries on import threads are reported under endpoint="import" in /metrics
+_executor = ThreadPoolExecutor(
+    max_workers=IMPORT_WORKERS,
+    thread_name_prefix="csv-import",
+    initializer=current_endpoint.set,
+    initargs=("import",)
+)
+
+
+def _spool(upload: BinaryIO) -> Tuple[str, str]:
+    """Copy an upload to a temp file in blocks, returning its path and SHA-256"""
+    content_hash = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(mode='wb', delete=False, prefix='import-', suffix='.csv') as spool:
+        try:
+            for block in iter(lambda: upload.read(SPOOL_BLOCK_SIZE), b""):
+                content_hash.update(block)
+                spool.write(block)
+        except BaseException:
+            spool.close()
+            os.unlink(spool.name)
+            raise
+    return spool.name, content_hash.hexdigest()
+
+
+def _previous_import(db: Session, user_id: int, content_hash: str, target_year: int) -> Optional[ImportJob]:
+    """This user's latest completed import of the same file for the same year"""
+    return db.query(ImportJob).filter(
+        ImportJob.user_id == user_id,
+        ImportJob.content_hash == content_hash,
+        ImportJob.target_year == target_year,
+        ImportJob.status == 'completed'
+    ).order_by(ImportJob.id.desc()).first()
+
+
+def _unchanged_stats(previous: ImportJob) -> Dict:
+    """Stats for re-uploading a file that was imported before: every row is already stored"""
+    stats = dict(previous.stats)
+    stats["unchanged"] = sum(stats.get(key, 0) for key in ("imported", "updated", "duplicates", "unchanged"))
+    stats["imported"] = stats["updated"] = stats["duplicates"] = 0
+    stats["unchanged_checklists"] = stats.get("checklists", 0)
+    return stats
+
+
+def enqueue_import(db: Session, user_id: int, upload: BinaryIO, filename: str, target_year: int = 2026) -> ImportJob:
+    """
+    Spool an upload to a temp file, create its job row and queue it.
+    The upload is copied in blocks rather than read into memory.
+
+    A file identical to one this user already imported is not queued: its
+    job is created completed, with the earlier import's stats.
+    """
+    spool_path, content_hash = _spool(upload)
+
+    previous = _previous_import(db, user_id, content_hash, target_year)
+    if previous:
+        os.unlink(spool_path)
+        stats = _unchanged_stats(previous)
+        job = ImportJob(
+            user_id=user_id,
+            status='completed',
+            filename=filename,
+            content_hash=content_hash,
+            target_year=target_year,
+            rows_parsed=previous.rows_parsed,
+            imported=0,
+            duplicates=stats["duplicates"],
+            stats=stats,
+            finished_at=func.now()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    job = ImportJob(
+        user_id=user_id, status='queued', filename=filename, content_hash=content_hash,
+        target_year=target_year, worker_id=WORKER_ID
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    future = _executor.submit(run_import_job, job.id, spool_path, user_id, target_year)
+    with _pending_lock:
+        _pending[future] = (job.id, spool_path)
+    future.add_done_callback(_forget_pending)
+    return job
+
+
+def _forget_pending(future: Future):
+    with _pending_lock:
+        _pending.pop(future, None)
+
+
+def _update_job(job_id: int, **values):
+    """Write job progress in its own short transaction"""
+    db = SessionLocal()
+    try:
+        values["updated_at"] = func.now()
+        db.query(ImportJob).filter(ImportJob.id == job_id).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_import_job(job_id: int, spool_path: str, user_id: int, target_year: int):
+    """Worker entry point: parse and import one spooled upload"""
+    _update_job(job_id, status='running')
+
+    def report(stats: Dict):
+        _update_job(
+            job_id,
+            rows_parsed=stats["total_rows"],
+            imported=stats["imported"],
+            duplicates=stats["duplicates"]
+        )
+
+    db = SessionLocal()
+    try:
+        stats = parse_ebird_csv(spool_path, user_id, db, target_year=target_year, progress=report)
+        if stats["imported"]:
+            invalidate_leaderboard()
+            invalidate_user_stats(user_id, target_year)
+            invalidate_comparisons(user_id, target_year)
+        _update_job(
+            job_id,
+            status='completed',
+            rows_parsed=stats["total_rows"],
+            imported=stats["imported"],
+            duplicates=stats["duplicates"],
+            stats=stats,
+            finished_at=func.now()
+        )
+    except ValueError as e:
+        # ValueError is user-facing (missing columns, parse errors)
+        _update_job(job_id, status='failed', error=str(e), finished_at=func.now())
+    except Exception as e:
+        # Log full error server-side, store generic message for the client
+        print(f"CSV import job {job_id} failed for user {user_id}: {e}")
+        _update_job(
+            job_id,
+            status='failed',
+            error="Error processing CSV file. Please ensure the file is a valid eBird export.",
+            finished_at=func.now()
+        )
+    finally:
+        db.close()
+        if os.path.exists(spool_path):
+            os.unlink(spool_path)
+
+
+def start_import_workers():
+    """Take this process's worker lock; call at startup, before any upload is queued"""
+    global _owner_connection
+    _owner_connection = engine.connect()
+    _owner_connection.execute(text(f"SELECT pg_advisory_lock({WORKER_LOCK})"), {"worker_id": WORKER_ID})
+    _owner_connection.commit()
+
+
+def _worker_gone(db: Session, worker_id: str) -> bool:
+    """True if no process holds worker_id's lock (taken and released again to check)"""
+    params = {"worker_id": worker_id}
+    if not db.execute(text(f"SELECT pg_try_advisory_lock({WORKER_LOCK})"), params).scalar():
+        return False
+    db.execute(text(f"SELECT pg_advisory_unlock({WORKER_LOCK})"), params)
+    return True
+
+
+def fail_abandoned_jobs(db: Session):
+    """
+    Mark jobs left queued/running by a process that is gone as failed:
+    its worker lock is free, or (for jobs without an owner) it made no
+    progress for STALE_JOB_AFTER
+    """
+    owners = db.execute(text("""
+        SELECT DISTINCT worker_id FROM import_jobs
+        WHERE status IN ('queued', 'running') AND worker_id IS NOT NULL AND worker_id != :worker_id
+    """), {"worker_id": WORKER_ID}).scalars().all()
+    gone = [owner for owner in owners if _worker_gone(db, owner)]
+
+    db.query(ImportJob).filter(
+        ImportJob.status.in_(['queued', 'running']),
+        or_(ImportJob.worker_id.in_(gone), ImportJob.updated_at < func.now() - STALE_JOB_AFTER)
+    ).update({
+        "status": 'failed',
+        "error": INTERRUPTED_ERROR,
+        "finished_at": func.now()
+    }, synchronize_session=False)
+    db.commit()
+
+
+def shutdown_import_workers():
+    """
+    Fail queued jobs that have not started and delete their spools, let
+    running imports finish, then release this process's worker lock
+    """
+    with _pending_lock:
+        pending = list(_pending.items())
+    for future, (job_id, spool_path) in pending:
+        if future.cancel():
+            _update_job(job_id, status='failed', error=INTERRUPTED_ERROR, finished_at=func.now())
+            if os.path.exists(spool_path):
+                os.unlink(spool_path)
+
+    _executor.shutdown(wait=True, cancel_futures=True)
+
+    if _owner_connection is not None:
+        _owner_connection.close()
@@ -0,0 +1,173 @@
+"""
+Live leaderboard updates over Postgres LISTEN/NOTIFY.
+
+Transactions that change a user's standing call notify_leaderboard_change;
+Postgres delivers the notification only if the transaction commits. Every
+worker LISTENs on one connection, drops its own caches for the user (so
+workers invalidate each other) and, when SSE clients are connected, reads
+the user's new row and rank once and pushes it to all of them.
+"""
+from typing import Dict, Optional, Set
+import asyncio
+import json
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from database import DATABASE_URL, AsyncSessionLocal
+from cache import invalidate_comparisons, invalidate_leaderboard, invalidate_user, invalidate_user_stats
+
+CHANNEL = "leaderboard_changes"
+
+# Seconds between reconnection attempts when the LISTEN connection drops
+RECONNECT_DELAY_SECONDS = 5
+
+# Updates buffered per SSE client; a client that falls further behind is told to reload
+SUBSCRIBER_QUEUE_SIZE = 100
+
+_subscribers: Dict[asyncio.Queue, int] = {}
+_listener_task: Optional[asyncio.Task] = None
+
+
+def notify_leaderboard_change(db: Session, user_id: int, year: Optional[int], reason: str):
+    """
+    Queue a change notification in the caller's transaction; it is sent on commit.
+    year is None when every year's row changed (profile edits).
+    """
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": json.dumps({"user_id": user_id, "year": year, "reason": reason})}
+    )
+
+
+def subscribe(year: int) -> asyncio.Queue:
+    """Register an SSE client for one year's updates"""
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _subscribers[queue] = year
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue):
+    _subscribers.pop(queue, None)
+
+
+def _publish(year: int, event: str, data: dict):
+    for queue, subscribed_year in list(_subscribers.items()):
+        if subscribed_year != year:
+            continue
+        try:
+            queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            # Deltas were lost; replace the backlog with a single reload
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(("reset", {}))
+
+
+async def _standing(user_id: int, year: int) -> dict:
+    """The user's leaderboard entry, competition rank and participant count after the change"""
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(text("""
+            SELECT
+                s.user_id, s.user_name, s.species_count, s.last_observation_date, s.privacy_level,
+                1 + (
+                    SELECT COUNT(*) FROM user_year_summary r
+                    WHERE r.year = s.year AND r.privacy_level != 'private'
+                    AND r.species_count > s.species_count
+                ) AS rank,
+                (
+                    SELECT COUNT(*) FROM user_year_summary p
+                    WHERE p.year = s.year AND p.privacy_level != 'private'
+                ) AS participants
+            FROM user_year_summary s
+            WHERE s.user_id = :user_id AND s.year = :year
+        """), {"user_id": user_id, "year": year})).first()
+
+    if row is None:
+        return {"user_id": user_id, "removed": True}
+    if row.privacy_level == 'private':
+        return {"user_id": user_id, "removed": True, "participants": row.participants}
+    return {
+        "user_id": row.user_id,
+        "name": row.user_name,
+        "species_count": row.species_count,
+        "last_observation_date": row.last_observation_date.isoformat() if row.last_observation_date else None,
+        "privacy_level": row.privacy_level,
+        "rank": row.rank,
+        "participants": row.participants
+    }
+
+
+async def _handle(payload: str):
+    change = json.loads(payload)
+    user_id, year = change["user_id"], change["year"]
+
+    # The committing worker already did this; the others learn of it here
+    invalidate_leaderboard()
+    invalidate_comparisons(user_id, year)
+    if year is None:
+        invalidate_user(user_id)
+    else:
+        invalidate_user_stats(user_id, year)
+
+    years: Set[int] = set(_subscribers.values())
+    if year is not None:
+        years &= {year}
+    for subscribed_year in years:
+        data = await _standing(user_id, subscribed_year)
+        _publish(subscribed_year, "update", {**data, "reason": change["reason"]})
+
+
+def _on_notification(connection, pid, channel, payload):
+    task = asyncio.get_running_loop().create_task(_handle(payload))
+    task.add_done_callback(_report_failure)
+
+
+def _report_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Handling leaderboard notification failed: {task.exception()}")
+
+
+async def _listen():
+    dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(CHANNEL, _on_notification)
+            await closed.wait()
+            print("Leaderboard LISTEN connection closed, reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Leaderboard LISTEN connection failed: {e}")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        # Changes may have been missed while disconnected
+        invalidate_leaderboard()
+        for year in set(_subscribers.values()):
+            _publish(year, "reset", {})
+        await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+
+def start_listener():
+    """Start this worker's LISTEN connection (call from the running event loop)"""
+    global _listener_task
+    if _listener_task is None:
+        _listener_task = asyncio.get_running_loop().create_task(_listen())
+
+
+async def stop_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
@@ -5,71 +5,37 @@ Main application entry point
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import os
 
 from routers import auth, upload, leaderboard, user, feedback
-from database import SessionLocal
+from routers.upload import UploadSizeLimitMiddleware
+from database import SessionLocal, engine, async_engine
+from import_jobs import fail_abandoned_jobs, shutdown_import_workers, start_import_workers
+from leaderboard_events import start_listener, stop_listener
+from migrations import run_migrations
+from metrics import MetricsMiddleware, instrument_engine, render_metrics
 from sqlalchemy import text
 
 
-def run_migrations():
-    """Run database migrations on startup"""
-    db = SessionLocal()
-    try:
-        # Check if materialized view needs the countable species filter
-        # by looking for the filter pattern in the view definition
-        check_query = text("""
-            SELECT pg_get_viewdef('species_summary'::regclass, true)
-        """)
-        result = db.execute(check_query).scalar()
-
-        # If the view doesn't have the countable filter, recreate it
-        if result and "Domestic" not in result:
-            print("Updating species_summary view with countable species filter...")
-            migration_sql = text("""
-                DROP MATERIALIZED VIEW IF EXISTS species_summary CASCADE;
-
-                CREATE MATERIALIZED VIEW species_summary AS
-                SELECT
-                    u.id AS user_id,
-                    u.name AS user_name,
-                    u.email AS user_email,
-                    u.privacy_level,
-                    COUNT(DISTINCT o.scientific_name) AS species_count,
-                    MAX(o.observation_date) AS last_observation_date,
-                    MAX(o.uploaded_at) AS last_upload_date
-                FROM users u
-                LEFT JOIN observations o ON u.id = o.user_id
-                    AND EXTRACT(YEAR FROM o.observation_date) = 2026
-                    AND o.common_name NOT LIKE '%(Domestic%'
-                    AND o.common_name NOT LIKE '%hybrid%'
-                    AND o.common_name NOT LIKE '% x %'
-                    AND o.common_name NOT LIKE '%/%'
-                    AND o.common_name NOT LIKE '%sp.%'
-                GROUP BY u.id, u.name, u.email, u.privacy_level
-                ORDER BY species_count DESC, last_observation_date DESC;
-
-                CREATE UNIQUE INDEX idx_species_summary_user ON species_summary(user_id);
-            """)
-            db.execute(migration_sql)
-            db.commit()
-            print("Migration complete!")
-        else:
-            print("species_summary view is up to date")
-    except Exception as e:
-        print(f"Migration check/run failed: {e}")
-        db.rollback()
-    finally:
-        db.close()
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown events"""
     # Startup
     run_migrations()
+    start_import_workers()
+    db = SessionLocal()
+    try:
+        fail_abandoned_jobs(db)
+    finally:
+        db.close()
+    # Receive leaderboard changes committed by any worker
+    start_listener()
     yield
-    # Shutdown (nothing to do)
+    # Shutdown: fail queued imports, let running ones finish, then close pooled connections
+    await stop_listener()
+    shutdown_import_workers()
+    await async_engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -79,6 +45,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Refuse oversized uploads while they arrive (inside CORS, so browsers can read the 413)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Configure CORS
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 origins = [
@@ -97,6 +66,11 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],
 )
 
+# Request latency by route and statement timing by calling endpoint, for /metrics
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(upload.router)
@@ -116,13 +90,9 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    from database import SessionLocal
-
     try:
-        db = SessionLocal()
-        from sqlalchemy import text
-        db.execute(text("SELECT 1"))
-        db.close()
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         return {
             "status": "healthy",
             "database": "connected"
@@ -134,6 +104,11 @@ async def health_check():
             "error": str(e)
         }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency histograms of this worker process in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
@@ -0,0 +1,205 @@
+"""
+Latency metrics in Prometheus text format, served at /metrics.
+
+- http_request_duration_seconds: per route template, method and status,
+  measured until the response starts (so SSE streams count their setup only)
+- db_query_duration_seconds: every SQL statement, by the endpoint that ran
+  it ("import" for background imports, "other" outside requests) and verb
+- import_phase_duration_seconds: time spent in each parse_ebird_csv phase;
+  chunked phases observe once per chunk, so compare the _sum series
+
+Each worker process keeps its own numbers; scrape every worker (or run one
+worker per scrape target) to see the whole deployment.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Label of the job running in this context, or the ASGI scope of the request
+# being handled (its route is only known once the router has matched)
+current_endpoint: ContextVar[Union[str, dict]] = ContextVar("current_endpoint", default="other")
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, safe to observe from any thread"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> (per-bucket counts with +Inf last, sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(labelvalues) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._series[labelvalues] = (counts, total + value)
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """Observation count and sum of each series"""
+        with self._lock:
+            return {labels: (sum(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labelvalues, counts, total in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+            yield f"{self.name}_sum{{{labels}}} {total}"
+            yield f"{self.name}_count{{{labels}}} {cumulative}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time until the response starts, by route",
+    ("method", "route", "status"), REQUEST_BUCKETS
+)
+query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time, by calling endpoint",
+    ("endpoint", "statement"), QUERY_BUCKETS
+)
+import_phase_duration = Histogram(
+    "import_phase_duration_seconds", "Time spent in each CSV import phase",
+    ("phase",), PHASE_BUCKETS
+)
+
+REGISTRY = (request_duration, query_duration, import_phase_duration)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+@contextmanager
+def phase_timer(phase: str):
+    """Time a block as one observation of an import phase"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        import_phase_duration.observe(time.perf_counter() - started, phase)
+
+
+def timed_iter(items: Iterable, phase: str) -> Iterator:
+    """Yield from items, timing each step as a phase (e.g. reading CSV chunks)"""
+    iterator = iter(items)
+    while True:
+        with phase_timer(phase):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def endpoint_context(endpoint: str):
+    """Attribute queries run in this block to endpoint"""
+    token = current_endpoint.set(endpoint)
+    try:
+        yield
+    finally:
+        current_endpoint.reset(token)
+
+
+def _statement_kind(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ""
+    if kind == "WITH":
+        # CTEs prefix SELECTs and data-modifying statements alike
+        return "WITH"
+    return kind if kind in ("SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "ALTER", "DROP", "REFRESH") else "OTHER"
+
+
+def _endpoint_label() -> str:
+    endpoint = current_endpoint.get()
+    return _route(endpoint) if isinstance(endpoint, dict) else endpoint
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    query_duration.observe(time.perf_counter() - started, _endpoint_label(), _statement_kind(statement))
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def instrument_engine(engine: Engine):
+    """Time every statement run through engine (pass async_engine.sync_engine for the async one)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request by its route template and
+    tagging queries run while handling it with that route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status: int):
+            nonlocal recorded
+            if not recorded:
+                recorded = True
+                request_duration.observe(time.perf_counter() - started, scope["method"], _route(scope), str(status))
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                record(message["status"])
+            await send(message)
+
+        token = current_endpoint.set(scope)
+        try:
+            await self.app(scope, receive, send_timed)
+        except Exception:
+            record(500)
+            raise
+        finally:
+            current_endpoint.reset(token)
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,375 @@
+"""
+Versioned schema migrations, applied at startup.
+
+Each migration runs once, in its own transaction together with the
+schema_version row recording it. When the recorded version is current
+(and this and next year's observation partitions exist) startup makes
+three small catalog queries and returns. Otherwise the first worker to take an
+advisory lock migrates while the others wait on it and then find nothing
+left to do.
+
+Add a migration by appending to MIGRATIONS with the next version and
+bumping the baseline version inserted by database/schema.sql.
+
+Usage: python migrations.py   (apply pending migrations by hand)
+"""
+from datetime import date
+from typing import Callable, List, Tuple
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+from aggregates import (
+    backfill_countable, backfill_user_year_species, backfill_user_year_summary, backfill_monthly_stats,
+    backfill_geographic_stats
+)
+from partitions import ensure_observation_partition, missing_observation_partitions, observations_partitioned, partition_observations
+
+MIGRATION_LOCK = "schema_migrations"
+
+# Tables added after the initial schema; each statement is a no-op when present
+CREATE_NEW_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+        filename VARCHAR(255),
+        rows_parsed INTEGER NOT NULL DEFAULT 0,
+        imported INTEGER NOT NULL DEFAULT 0,
+        duplicates INTEGER NOT NULL DEFAULT 0,
+        stats JSONB,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW(),
+        finished_at TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_import_jobs_user ON import_jobs(user_id, created_at DESC);
+
+    CREATE TABLE IF NOT EXISTS user_year_summary (
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        year INTEGER NOT NULL,
+        user_name VARCHAR(255) NOT NULL,
+        user_email VARCHAR(255) NOT NULL,
+        privacy_level VARCHAR(20) NOT NULL,
+        species_count INTEGER NOT NULL DEFAULT 0,
+        total_observations INTEGER NOT NULL DEFAULT 0,
+        states_visited INTEGER NOT NULL DEFAULT 0,
+        last_observation_date DATE,
+        last_upload_date TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (user_id, year)
+    );
+
+    DROP INDEX IF EXISTS idx_user_year_summary_rank;
+    CREATE INDEX IF NOT EXISTS idx_user_year_summary_leaderboard ON user_year_summary(
+        year, species_count DESC, COALESCE(last_observation_date, '-infinity'::date) DESC, user_id DESC
+    ) WHERE privacy_level != 'private';
+
+    CREATE INDEX IF NOT EXISTS idx_obs_user_date_id ON observations(user_id, observation_date DESC, id DESC)
+        INCLUDE (common_name, scientific_name, count, state_province, county, latitude, longitude, observation_time);
+
+    CREATE TABLE IF NOT EXISTS materialized_view_refreshes (
+        view_name VARCHAR(63) PRIMARY KEY,
+        dirty_since TIMESTAMP,
+        dirty_version BIGINT NOT NULL DEFAULT 0,
+        last_refresh_at TIMESTAMP,
+        last_refresh_ms INTEGER
+    );
+
+    CREATE TABLE IF NOT EXISTS user_county_species (
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        year INTEGER NOT NULL,
+        state_province VARCHAR(10) NOT NULL,
+        county VARCHAR(100) NOT NULL DEFAULT '',
+        scientific_name VARCHAR(255) NOT NULL,
+        PRIMARY KEY (user_id, year, state_province, county, scientific_name)
+    );
+
+    CREATE TABLE IF NOT EXISTS user_state_stats (
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        year INTEGER NOT NULL,
+        state_province VARCHAR(10) NOT NULL,
+        species_count INTEGER NOT NULL,
+        first_observation DATE,
+        last_observation DATE,
+        PRIMARY KEY (user_id, year, state_province)
+    );
+
+    CREATE TABLE IF NOT EXISTS user_year_species (
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        year INTEGER NOT NULL,
+        scientific_name VARCHAR(255) NOT NULL,
+        common_name VARCHAR(255) NOT NULL,
+        first_observation_date DATE NOT NULL,
+        state_province VARCHAR(10),
+        countable BOOLEAN NOT NULL DEFAULT TRUE,
+        PRIMARY KEY (user_id, year, scientific_name)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_user_year_species_species ON user_year_species(year, scientific_name);
+
+    CREATE TABLE IF NOT EXISTS import_events (
+        id BIGSERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        year INTEGER NOT NULL,
+        observations_added INTEGER NOT NULL,
+        species_added INTEGER NOT NULL,
+        notable_species TEXT[] NOT NULL DEFAULT '{}',
+        created_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_import_events_year ON import_events(year, id DESC);
+"""
+
+SPECIES_SUMMARY_VIEW_SQL = """
+    DROP MATERIALIZED VIEW IF EXISTS species_summary CASCADE;
+
+    CREATE MATERIALIZED VIEW species_summary AS
+    SELECT
+        u.id AS user_id,
+        u.name AS user_name,
+        u.email AS user_email,
+        u.privacy_level,
+        COUNT(DISTINCT o.scientific_name) AS species_count,
+        MAX(o.observation_date) AS last_observation_date,
+        MAX(o.uploaded_at) AS last_upload_date
+    FROM users u
+    LEFT JOIN observations o ON u.id = o.user_id
+        AND o.observation_date >= DATE '2026-01-01'
+        AND o.observation_date < DATE '2027-01-01'
+        AND o.countable
+    GROUP BY u.id, u.name, u.email, u.privacy_level
+    ORDER BY species_count DESC, last_observation_date DESC;
+
+    CREATE UNIQUE INDEX idx_species_summary_user ON species_summary(user_id);
+"""
+
+
+def partition_years() -> set:
+    """Years whose observation partitions must exist: the competition year, this year and next"""
+    current_year = date.today().year
+    return {2026, current_year, current_year + 1}
+
+
+def _column_exists(db: Session, table: str, column: str) -> bool:
+    return db.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+    """), {"table": table, "column": column}).scalar()
+
+
+# Deployments from before versioning may already have any of these changes,
+# so each migration checks before altering.
+
+def create_new_tables(db: Session):
+    db.execute(text(CREATE_NEW_TABLES_SQL))
+
+
+def add_countable(db: Session):
+    """Store countability once instead of pattern-matching names in every query"""
+    if _column_exists(db, "observations", "countable"):
+        return
+    db.execute(text("""
+        ALTER TABLE observations ADD COLUMN countable BOOLEAN NOT NULL DEFAULT TRUE;
+        ALTER TABLE user_year_species ADD COLUMN IF NOT EXISTS countable BOOLEAN NOT NULL DEFAULT TRUE;
+    """))
+    backfill_countable(db)
+
+
+def partition_observations_by_year(db: Session):
+    """Every query is scoped to one year; partition observations so other years are pruned"""
+    if not observations_partitioned(db):
+        partition_observations(db, partition_years())
+
+
+def add_states_visited(db: Session):
+    """Profile stats read states_visited from user_year_summary"""
+    if _column_exists(db, "user_year_summary", "states_visited"):
+        return
+    db.execute(text("ALTER TABLE user_year_summary ADD COLUMN states_visited INTEGER NOT NULL DEFAULT 0"))
+    backfill_user_year_summary(db, 2026)
+
+
+def backfill_year_aggregates(db: Session):
+    """Populate per-user aggregates for deployments that predate them"""
+    if db.execute(text("SELECT NOT EXISTS (SELECT 1 FROM user_year_species)")).scalar():
+        backfill_user_year_species(db, 2026)
+    if db.execute(text("SELECT NOT EXISTS (SELECT 1 FROM user_year_summary)")).scalar():
+        backfill_user_year_summary(db, 2026)
+
+
+def rebuild_monthly_stats(db: Session):
+    """
+    monthly_stats used to be rebuilt by calculate_monthly_stats(), which stored
+    per-month distinct counts as if cumulative; rebuild once and drop it
+    """
+    if db.execute(text("SELECT to_regprocedure('calculate_monthly_stats(integer, integer)') IS NOT NULL")).scalar():
+        backfill_monthly_stats(db, 2026)
+        db.execute(text("DROP FUNCTION calculate_monthly_stats(INTEGER, INTEGER)"))
+
+
+def geographic_stats_by_year(db: Session):
+    """
+    geographic_stats used to be rebuilt across all years by calculate_geographic_stats();
+    key it by year, rebuild once and drop the function
+    """
+    if _column_exists(db, "geographic_stats", "year"):
+        return
+    db.execute(text("""
+        DELETE FROM geographic_stats;
+        ALTER TABLE geographic_stats ADD COLUMN year INTEGER NOT NULL;
+        ALTER TABLE geographic_stats DROP CONSTRAINT IF EXISTS geographic_stats_user_id_state_province_county_key;
+        CREATE UNIQUE INDEX idx_geo_user_year_county
+            ON geographic_stats(user_id, year, state_province, COALESCE(county, ''));
+        DROP FUNCTION IF EXISTS calculate_geographic_stats(INTEGER);
+    """))
+    backfill_geographic_stats(db, 2026)
+    backfill_user_year_summary(db, 2026)
+
+
+def species_summary_countable_filter(db: Session):
+    """Recreate species_summary with the countable species filter"""
+    db.execute(text(SPECIES_SUMMARY_VIEW_SQL))
+
+
+def add_upload_digests(db: Session):
+    """Content hash per upload and per-checklist digests, so unchanged files and checklists are skipped"""
+    db.execute(text("""
+        ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+        ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS target_year INTEGER;
+        CREATE INDEX IF NOT EXISTS idx_import_jobs_content ON import_jobs(user_id, content_hash)
+            WHERE status = 'completed';
+
+        CREATE TABLE IF NOT EXISTS checklist_digests (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            submission_id VARCHAR(50) NOT NULL,
+            digest BIGINT NOT NULL,
+            row_count INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (user_id, submission_id)
+        );
+    """))
+
+
+def add_import_job_owner(db: Session):
+    """Record which process owns each import job, so jobs of dead processes can be failed at startup"""
+    db.execute(text("""
+        ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS worker_id VARCHAR(32);
+        CREATE INDEX IF NOT EXISTS idx_import_jobs_unfinished ON import_jobs(worker_id)
+            WHERE status IN ('queued', 'running');
+    """))
+
+
+def species_summary_on_countable(db: Session):
+    """Filter species_summary on observations.countable and drop idx_obs_countable, which nothing reads"""
+    db.execute(text(SPECIES_SUMMARY_VIEW_SQL))
+    db.execute(text("DROP INDEX IF EXISTS idx_obs_countable"))
+
+
+def drop_species_summary(db: Session):
+    """Drop species_summary and its refresh bookkeeping; no endpoint has read it since user_year_summary"""
+    db.execute(text("""
+        DROP MATERIALIZED VIEW IF EXISTS species_summary;
+        DROP FUNCTION IF EXISTS refresh_species_summary();
+        DROP TABLE IF EXISTS materialized_view_refreshes;
+    """))
+
+
+# (version, description, migration); versions are applied in order and never reused
+MIGRATIONS: List[Tuple[int, str, Callable[[Session], None]]] = [
+    (1, "create tables added after the initial schema", create_new_tables),
+    (2, "add observations.countable", add_countable),
+    (3, "partition observations by year", partition_observations_by_year),
+    (4, "add user_year_summary.states_visited", add_states_visited),
+    (5, "backfill per-user year aggregates", backfill_year_aggregates),
+    (6, "rebuild monthly_stats and drop calculate_monthly_stats()", rebuild_monthly_stats),
+    (7, "key geographic_stats by year and drop calculate_geographic_stats()", geographic_stats_by_year),
+    (8, "species_summary countable species filter", species_summary_countable_filter),
+    (9, "import_jobs.content_hash and checklist_digests", add_upload_digests),
+    (10, "import_jobs.worker_id", add_import_job_owner),
+    (11, "species_summary on observations.countable, drop idx_obs_countable", species_summary_on_countable),
+    (12, "drop species_summary, refresh_species_summary() and materialized_view_refreshes", drop_species_summary),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(db: Session) -> int:
+    """Highest applied migration version (0 before the first versioned start)"""
+    if db.execute(text("SELECT to_regclass('schema_version')")).scalar() is None:
+        return 0
+    return db.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def _apply_pending(db: Session):
+    db.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            duration_ms INTEGER
+        )
+    """))
+    db.commit()
+
+    current = schema_version(db)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"Applying migration {version}: {description}...")
+        started = time.perf_counter()
+        migrate(db)
+        db.execute(text("""
+            INSERT INTO schema_version (version, description, duration_ms)
+            VALUES (:version, :description, :duration_ms)
+        """), {
+            "version": version,
+            "description": description,
+            "duration_ms": int((time.perf_counter() - started) * 1000)
+        })
+        db.commit()
+
+    for year in missing_observation_partitions(db, partition_years()):
+        ensure_observation_partition(db, year)
+    db.commit()
+
+
+def run_migrations():
+    """
+    Bring the schema up to LATEST_VERSION.
+    A failed migration is rolled back and logged; later ones are not attempted.
+    """
+    db = SessionLocal()
+    try:
+        if schema_version(db) >= LATEST_VERSION and not missing_observation_partitions(db, partition_years()):
+            return
+        db.rollback()
+
+        # Session-level lock on a dedicated connection; the session commits per migration
+        with engine.connect() as lock_conn:
+            lock_conn.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": MIGRATION_LOCK})
+            lock_conn.commit()
+            try:
+                _apply_pending(db)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": MIGRATION_LOCK})
+                lock_conn.commit()
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_migrations()
+    db = SessionLocal()
+    try:
+        print(f"Schema version: {schema_version(db)} (latest: {LATEST_VERSION})")
+    finally:
+        db.close()
@@ -2,6 +2,7 @@
 SQLAlchemy ORM Models
 """
 from sqlalchemy import Column, Integer, String, Float, Date, Time, DateTime, Boolean, Text, ForeignKey, CheckConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -31,6 +32,7 @@ class User(Base):
 class Observation(Base):
     __tablename__ = "observations"
 
+    # Partitioned by observation_date (one partition per year), which is part of the key
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     submission_id = Column(String(50), nullable=False, index=True)
@@ -44,7 +46,7 @@ class Observation(Base):
     location = Column(Text)
     latitude = Column(Float)
     longitude = Column(Float)
-    observation_date = Column(Date, nullable=False, index=True)
+    observation_date = Column(Date, primary_key=True, index=True)
     observation_time = Column(Time)
     protocol = Column(String(100))
     duration_min = Column(Integer)
@@ -56,6 +58,7 @@ class Observation(Base):
     observation_details = Column(Text)
     checklist_comments = Column(Text)
     ml_catalog_numbers = Column(Text)
+    countable = Column(Boolean, nullable=False, default=True)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -93,6 +96,7 @@ class GeographicStat(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    year = Column(Integer, nullable=False)
     state_province = Column(String(10), nullable=False, index=True)
     county = Column(String(100))
     species_count = Column(Integer, nullable=False)
@@ -106,3 +110,27 @@ class GeographicStat(Base):
         # Unique constraint for user + state + county
         CheckConstraint('1=1', name='unique_geographic_stat'),
     )
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default='queued')
+    filename = Column(String(255))
+    rows_parsed = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer, nullable=False, default=0)
+    stats = Column(JSONB)
+    error = Column(Text)
+    content_hash = Column(String(64))
+    target_year = Column(Integer)
+    worker_id = Column(String(32))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        CheckConstraint("status IN ('queued', 'running', 'completed', 'failed')", name='check_import_job_status'),
+    )
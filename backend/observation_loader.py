@@ -0,0 +1,154 @@
+"""
+Bulk loading of parsed observations via PostgreSQL COPY
+"""
+import io
+from typing import Iterable, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Column order of the records as produced by csv_parser.transform_observations()
+OBSERVATION_COLUMNS = (
+    "user_id", "submission_id", "common_name", "scientific_name", "taxonomic_order",
+    "count", "state_province", "county", "location_id", "location", "latitude",
+    "longitude", "observation_date", "observation_time", "protocol", "duration_min",
+    "all_obs_reported", "distance_traveled_km", "area_covered_ha", "num_observers",
+    "breeding_code", "observation_details", "checklist_comments", "ml_catalog_numbers",
+    "countable",
+)
+
+STAGING_TABLE = "observation_staging"
+
+# Rows inserted by the current import, for incremental aggregate updates
+IMPORTED_TABLE = "imported_observations"
+IMPORTED_COLUMNS = (
+    "id", "user_id", "scientific_name", "common_name", "observation_date",
+    "state_province", "county", "countable",
+)
+
+# Columns no aggregate depends on; edits to them in eBird are applied to stored rows
+DETAIL_COLUMNS = tuple(
+    column for column in OBSERVATION_COLUMNS if column not in IMPORTED_COLUMNS and column != "submission_id"
+)
+
+_COLUMN_LIST = ", ".join(OBSERVATION_COLUMNS)
+_IMPORTED_COLUMN_LIST = ", ".join(IMPORTED_COLUMNS)
+
+# Characters that must be backslash-escaped in COPY text format
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def create_staging_table(db_session: Session):
+    """Create a session-local staging table shaped like observations (dropped on commit)"""
+    db_session.execute(text(f"""
+        CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS
+        SELECT {_COLUMN_LIST} FROM observations WITH NO DATA
+    """))
+
+
+def _copy_field(value) -> str:
+    """Encode one value for COPY text format"""
+    if value is None:
+        return "\\N"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_to_staging(db_session: Session, records: Iterable[tuple]) -> int:
+    """
+    Stream observation records into the staging table over COPY FROM STDIN.
+    Records are tuples in OBSERVATION_COLUMNS order.
+
+    Returns:
+        Number of rows copied
+    """
+    buffer = io.StringIO()
+    rows = 0
+    for record in records:
+        buffer.write("\t".join(map(_copy_field, record)))
+        buffer.write("\n")
+        rows += 1
+    if not rows:
+        return 0
+    buffer.seek(0)
+
+    # COPY is not exposed by SQLAlchemy; use the session's psycopg2 connection
+    cursor = db_session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {STAGING_TABLE} ({_COLUMN_LIST}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+    return rows
+
+
+def merge_staging(db_session: Session) -> int:
+    """
+    Move staged rows into observations in a single statement.
+    A row is a duplicate if the user already has that species on that
+    checklist, whatever its date: a checklist re-dated in eBird must not be
+    inserted twice. The partitioned unique key has to include
+    observation_date, so the check is a NOT EXISTS rather than the
+    conflict target; ON CONFLICT still skips repeats within the upload.
+
+    The rows actually inserted are captured in the IMPORTED_TABLE temp table
+    (dropped on commit) so aggregates can be updated from new rows only.
+
+    Returns:
+        Number of rows actually inserted
+    """
+    db_session.execute(text(f"""
+        CREATE TEMP TABLE {IMPORTED_TABLE} ON COMMIT DROP AS
+        SELECT {_IMPORTED_COLUMN_LIST} FROM observations WITH NO DATA
+    """))
+    return db_session.execute(text(f"""
+        WITH inserted AS (
+            INSERT INTO observations ({_COLUMN_LIST})
+            SELECT {_COLUMN_LIST} FROM {STAGING_TABLE} s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM observations o
+                WHERE o.user_id = s.user_id
+                  AND o.submission_id = s.submission_id
+                  AND o.scientific_name = s.scientific_name
+            )
+            ON CONFLICT (user_id, submission_id, scientific_name, observation_date) DO NOTHING
+            RETURNING {_IMPORTED_COLUMN_LIST}
+        )
+        INSERT INTO {IMPORTED_TABLE} SELECT * FROM inserted
+    """)).rowcount
+
+
+def update_staged_details(db_session: Session) -> int:
+    """
+    Apply edited DETAIL_COLUMNS of staged rows to the stored rows for the
+    same species on the same checklist. Returns the number of rows changed.
+    """
+    stored = ", ".join(f"o.{column}" for column in DETAIL_COLUMNS)
+    staged = ", ".join(f"s.{column}" for column in DETAIL_COLUMNS)
+    return db_session.execute(text(f"""
+        UPDATE observations o SET ({", ".join(DETAIL_COLUMNS)}) = ({staged})
+        FROM {STAGING_TABLE} s
+        WHERE o.user_id = s.user_id
+          AND o.submission_id = s.submission_id
+          AND o.scientific_name = s.scientific_name
+          AND ({stored}) IS DISTINCT FROM ({staged})
+    """)).rowcount
+
+
+def staged_checklists(db_session: Session) -> List[Tuple[str, int, bool]]:
+    """
+    (submission_id, staged rows, merged) for each staged checklist, where
+    merged means every staged row is now stored exactly as staged. Rows
+    whose date, name or location was edited stay unmerged (those columns
+    feed the aggregates and are not updated in place).
+    """
+    stored = ", ".join(f"o.{column}" for column in OBSERVATION_COLUMNS)
+    staged = ", ".join(f"s.{column}" for column in OBSERVATION_COLUMNS)
+    return [tuple(row) for row in db_session.execute(text(f"""
+        SELECT s.submission_id, COUNT(*), BOOL_AND(EXISTS (
+            SELECT 1 FROM observations o
+            WHERE o.user_id = s.user_id
+              AND o.submission_id = s.submission_id
+              AND o.scientific_name = s.scientific_name
+              AND ({stored}) IS NOT DISTINCT FROM ({staged})
+        ))
+        FROM {STAGING_TABLE} s
+        GROUP BY s.submission_id
+    """))]
@@ -0,0 +1,37 @@
+"""
+Opaque cursors for keyset pagination
+"""
+from datetime import date
+from typing import Any, Dict, Optional
+import base64
+import json
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Pack the sort key of the last row returned into a URL-safe token"""
+    payload = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *fields: str) -> Dict[str, Any]:
+    """Unpack a cursor produced by encode_cursor, requiring the given fields"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, dict) or any(field not in values for field in fields):
+            raise ValueError(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+def cursor_date(value: Optional[str]) -> Optional[date]:
+    """Turn a date stored in a cursor back into a date for query parameters"""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
@@ -0,0 +1,96 @@
+"""
+Yearly range partitions of the observations table.
+
+observations is partitioned by observation_date, one partition per calendar
+year (observations_2026 holds 2026-01-01 up to, not including, 2027-01-01).
+Queries select a year with observation_date >= make_date(:year, 1, 1) AND
+observation_date < make_date(:year + 1, 1, 1) so the planner prunes the
+other years' partitions; EXTRACT(YEAR FROM observation_date) would not.
+"""
+from typing import Iterable, List
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Indexes defined on the partitioned table (Postgres creates them on every partition)
+OBSERVATION_INDEXES_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_obs_user_date ON observations(user_id, observation_date);
+    CREATE INDEX IF NOT EXISTS idx_obs_date ON observations(observation_date);
+    CREATE INDEX IF NOT EXISTS idx_obs_submission ON observations(submission_id);
+    CREATE INDEX IF NOT EXISTS idx_obs_species ON observations(scientific_name);
+    CREATE INDEX IF NOT EXISTS idx_obs_state ON observations(state_province);
+    CREATE INDEX IF NOT EXISTS idx_obs_user_date_id ON observations(user_id, observation_date DESC, id DESC)
+        INCLUDE (common_name, scientific_name, count, state_province, county, latitude, longitude, observation_time);
+"""
+
+
+def partition_name(year: int) -> str:
+    return f"observations_{int(year)}"
+
+
+def ensure_observation_partition(db: Session, year: int):
+    """
+    Create the partition for one year if it does not exist yet.
+    Creating a partition locks the observations table, so callers commit
+    right away instead of holding the lock through a long transaction.
+    """
+    year = int(year)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": partition_name(year)}).scalar() is None:
+        db.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF observations
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+        """))
+
+
+def missing_observation_partitions(db: Session, years: Iterable[int]) -> List[int]:
+    """Years among the given ones that have no partition yet (one catalog query)"""
+    return db.execute(text("""
+        SELECT year FROM unnest(CAST(:years AS INTEGER[])) AS year
+        WHERE to_regclass('observations_' || year) IS NULL
+        ORDER BY year
+    """), {"years": sorted(int(year) for year in years)}).scalars().all()
+
+
+def observations_partitioned(db: Session) -> bool:
+    return db.execute(text("""
+        SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('observations')
+    """)).scalar()
+
+
+def partition_observations(db: Session, years: Iterable[int]):
+    """
+    Replace the unpartitioned observations table with a partitioned copy
+    (one-time, used by migrations). Partitions are created for every year
+    that has rows plus the given years. ids and the id sequence carry over.
+
+    Drops the legacy species_summary view, which depends on the old
+    table. Runs in the caller's transaction and rewrites the
+    whole table, so the app must not be serving imports meanwhile.
+    """
+    db.execute(text("""
+        DROP MATERIALIZED VIEW IF EXISTS species_summary;
+        ALTER TABLE observations RENAME TO observations_unpartitioned;
+        ALTER SEQUENCE observations_id_seq OWNED BY NONE;
+
+        CREATE TABLE observations (LIKE observations_unpartitioned INCLUDING DEFAULTS)
+            PARTITION BY RANGE (observation_date);
+        ALTER SEQUENCE observations_id_seq OWNED BY observations.id;
+    """))
+
+    existing = db.execute(text("""
+        SELECT DISTINCT EXTRACT(YEAR FROM observation_date)::INTEGER FROM observations_unpartitioned
+    """)).scalars().all()
+    for year in sorted(set(existing) | set(years)):
+        ensure_observation_partition(db, year)
+
+    # Keys and indexes are built after the copy; their names are free once the old table is gone
+    db.execute(text("""
+        INSERT INTO observations SELECT * FROM observations_unpartitioned;
+        DROP TABLE observations_unpartitioned;
+
+        ALTER TABLE observations
+            ADD PRIMARY KEY (id, observation_date),
+            ADD CONSTRAINT observations_user_submission_species_key
+                UNIQUE (user_id, submission_id, scientific_name, observation_date),
+            ADD FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+    """))
+    db.execute(text(OBSERVATION_INDEXES_SQL))
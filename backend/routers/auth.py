@@ -2,9 +2,10 @@
 Authentication endpoints for magic link login
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from database import get_db
+from database import get_async_db
 from schemas import (
     MagicLinkRequest,
     MagicLinkResponse,
@@ -16,6 +17,7 @@ from auth import (
     verify_magic_link,
     send_magic_link_email,
     create_access_token,
+    user_token_claims,
     MAGIC_LINK_EXPIRE_MINUTES
 )
 
@@ -24,16 +26,16 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 @router.post("/request-magic-link", response_model=MagicLinkResponse)
 async def request_magic_link(
     request: MagicLinkRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Request a magic link login email.
     Creates user if email doesn't exist.
     """
-    user, token = create_magic_link(request.email, db)
+    user, token = await create_magic_link(request.email, db)
 
-    # Send email with magic link
-    send_magic_link_email(request.email, token)
+    # Send email with magic link (blocking HTTP call, keep it off the event loop)
+    await run_in_threadpool(send_magic_link_email, request.email, token)
 
     return MagicLinkResponse(
         message="Magic link sent to email",
@@ -43,13 +45,13 @@ async def request_magic_link(
 @router.get("/verify", response_model=TokenResponse)
 async def verify_magic_link_token(
     token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Verify magic link token and return JWT access token.
     Token is single-use and expires after verification.
     """
-    user = verify_magic_link(token, db)
+    user = await verify_magic_link(token, db)
 
     if not user:
         raise HTTPException(
@@ -58,7 +60,7 @@ async def verify_magic_link_token(
         )
 
     # Create JWT access token
-    access_token = create_access_token(data={"user_id": user.id, "email": user.email})
+    access_token = create_access_token(data=user_token_claims(user))
 
     return TokenResponse(
         access_token=access_token,
@@ -1,105 +1,324 @@
 """
 Leaderboard endpoints
 """
-from fastapi import APIRouter, Depends, Query, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from hashlib import sha1
+from typing import Optional
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text
 
-from database import get_db
+from database import get_async_db
+from cache import compare_cache, leaderboard_cache
+from leaderboard_events import subscribe, unsubscribe
+from pagination import encode_cursor, decode_cursor, cursor_date
 from schemas import (
     LeaderboardResponse, LeaderboardEntry, MonthlyProgressResponse, MonthlyProgress,
-    PublicUserSpeciesResponse, PublicSpeciesEntry
+    PublicUserSpeciesResponse, PublicSpeciesEntry, SpeciesComparisonResponse,
+    ComparisonStats, SpeciesInfo, UserSummary, ActivityFeedResponse, ActivityItem
 )
 from models import MonthlyStat, User
 
-# SQL condition to filter out uncountable species (domestics, hybrids, spuhs, slashes)
-COUNTABLE_SPECIES_FILTER = """
-    common_name NOT LIKE '%%(Domestic%%'
-    AND common_name NOT LIKE '%%hybrid%%'
-    AND common_name NOT LIKE '%% x %%'
-    AND common_name NOT LIKE '%%/%%'
-    AND common_name NOT LIKE '%%sp.%%'
-"""
-
 router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
 
+# Ranking window per rank mode. Ties share a rank when species counts are equal;
+# last_observation_date only orders tied users. Ranks continue from the cursor:
+# rows tied with the last row of the previous page keep its rank.
+RANK_EXPRESSIONS = {
+    "competition": "CASE WHEN tied THEN :cursor_rank ELSE :cursor_position + RANK() OVER ranking END",
+    "dense": "(:cursor_rank + DENSE_RANK() OVER ranking - CASE WHEN bool_or(tied) OVER () THEN 1 ELSE 0 END)",
+}
+
+# Sort key matching idx_user_year_summary_leaderboard; users without
+# observations (NULL date) sort last
+RANK_DATE = "COALESCE(last_observation_date, '-infinity'::date)"
+
+# Sort key, rank and position of the last row of a page
+CURSOR_FIELDS = ("species_count", "last_observation_date", "user_id", "rank", "position")
+
+# Seconds between SSE comments that keep idle streams open through proxies
+STREAM_KEEPALIVE_SECONDS = 15
+
+
 @router.get("", response_model=LeaderboardResponse)
 async def get_leaderboard(
+    request: Request,
     year: int = Query(2026, description="Year to filter by"),
-    limit: int = Query(100, description="Number of results", le=500),
-    db: Session = Depends(get_db)
+    limit: int = Query(100, description="Number of results", ge=1, le=500),
+    ranking: str = Query("competition", description="Rank ties as: competition (1, 1, 3) or dense (1, 1, 2)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get public leaderboard with rankings.
     Excludes users with privacy_level='private'.
     Ranks by species_count DESC, then last_observation_date DESC (tiebreaker).
+    Pages past the first are requested with the previous page's next_cursor.
+    Responses are cached until the next import or profile change and carry
+    an ETag; a matching If-None-Match gets 304 Not Modified.
+    """
+    if ranking not in RANK_EXPRESSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ranking must be 'competition' or 'dense'"
+        )
+
+    cache_key = (year, limit, ranking, cursor)
+    cached = leaderboard_cache.get(cache_key)
+    if cached is None:
+        after = decode_cursor(cursor, *CURSOR_FIELDS) if cursor else None
+        body = (await build_leaderboard(db, year, limit, ranking, after)).model_dump_json().encode()
+        cached = (body, f'"{sha1(body).hexdigest()}"')
+        leaderboard_cache.set(cache_key, cached)
+    body, etag = cached
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def build_leaderboard(db: AsyncSession, year: int, limit: int, ranking: str, after: Optional[dict] = None) -> LeaderboardResponse:
     """
-    # Query species_summary materialized view
-    query = text("""
+    Fetch one ranked page and the participant count in a single query.
+    Pages seek past the previous page's last row on idx_user_year_summary_leaderboard,
+    so later pages never re-read earlier rows; participants is the rows already
+    paged through plus COUNT(*) OVER the remaining ones.
+    """
+    params = {"year": year, "limit": limit, "cursor_rank": 0, "cursor_position": 0, "cursor_species_count": None}
+    seek = ""
+    if after:
+        seek = f"""
+            AND (species_count, {RANK_DATE}, user_id)
+                < (:cursor_species_count, COALESCE(CAST(:cursor_date AS DATE), '-infinity'::date), :cursor_user_id)
+        """
+        params.update({
+            "cursor_species_count": after["species_count"],
+            "cursor_date": cursor_date(after["last_observation_date"]),
+            "cursor_user_id": after["user_id"],
+            "cursor_rank": after["rank"],
+            "cursor_position": after["position"],
+        })
+
+    query = text(f"""
         SELECT
             user_id,
             user_name,
             species_count,
             last_observation_date,
-            privacy_level
-        FROM species_summary
-        WHERE privacy_level != 'private'
-        ORDER BY species_count DESC, last_observation_date DESC
+            privacy_level,
+            {RANK_EXPRESSIONS[ranking]} AS rank,
+            :cursor_position + COUNT(*) OVER () AS participants
+        FROM (
+            SELECT
+                user_id, user_name, species_count, last_observation_date, privacy_level,
+                species_count = CAST(:cursor_species_count AS INTEGER) IS TRUE AS tied
+            FROM user_year_summary
+            WHERE year = :year
+            AND privacy_level != 'private'
+            {seek}
+        ) page
+        WINDOW ranking AS (ORDER BY species_count DESC)
+        ORDER BY species_count DESC, {RANK_DATE} DESC, user_id DESC
         LIMIT :limit
     """)
 
-    result = db.execute(query, {"limit": limit})
-    rows = result.fetchall()
+    rows = (await db.execute(query, params)).fetchall()
 
-    # Add rank numbers
-    leaderboard = []
-    for rank, row in enumerate(rows, start=1):
-        leaderboard.append(LeaderboardEntry(
-            rank=rank,
+    leaderboard = [
+        LeaderboardEntry(
+            rank=row.rank,
             user_id=row.user_id,
             name=row.user_name,
             species_count=row.species_count or 0,
             last_observation_date=row.last_observation_date,
             privacy_level=row.privacy_level
-        ))
+        )
+        for row in rows
+    ]
 
-    # Count total participants (excluding private)
-    count_query = text("""
-        SELECT COUNT(*)
-        FROM species_summary
-        WHERE privacy_level != 'private'
-    """)
-    participants = db.execute(count_query).scalar()
+    participants = rows[0].participants if rows else params["cursor_position"]
+    position = params["cursor_position"] + len(rows)
+
+    next_cursor = None
+    if position < participants:
+        last = rows[-1]
+        next_cursor = encode_cursor({
+            "species_count": last.species_count,
+            "last_observation_date": last.last_observation_date,
+            "user_id": last.user_id,
+            "rank": last.rank,
+            "position": position,
+        })
 
     return LeaderboardResponse(
         year=year,
-        participants=participants or 0,
-        leaderboard=leaderboard
+        participants=participants,
+        leaderboard=leaderboard,
+        next_cursor=next_cursor
     )
 
+@router.get("/stream")
+async def stream_leaderboard(
+    request: Request,
+    year: int = Query(2026, description="Year to follow")
+):
+    """
+    Server-Sent Events stream of leaderboard changes.
+    An "update" event carries one user's new entry, competition rank and the
+    participant count (or removed: true once the user is private) after each
+    import or profile change commits. A "reset" event means updates were
+    missed and the client should reload /leaderboard.
+    """
+    async def events():
+        queue = subscribe(year)
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/activity", response_model=ActivityFeedResponse)
+async def get_activity(
+    year: int = Query(2026, description="Year to filter by"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Most recent imports, newest first, with new year species and the rarest of them.
+    Reads the import_events log backwards along idx_import_events_year, so the
+    cost depends on limit, not on how many events or observations exist.
+    Imports by private users are left out.
+    """
+    result = await db.execute(text("""
+        SELECT e.created_at, e.observations_added, e.species_added, e.notable_species, u.name
+        FROM import_events e
+        JOIN users u ON u.id = e.user_id
+        WHERE e.year = :year
+        AND u.privacy_level != 'private'
+        ORDER BY e.id DESC
+        LIMIT :limit
+    """), {"year": year, "limit": limit})
+
+    return ActivityFeedResponse(recent_activity=[
+        ActivityItem(
+            type="upload",
+            user_name=row.name,
+            timestamp=row.created_at,
+            species_added=row.species_added,
+            notable_species=row.notable_species,
+            message=f"Uploaded {row.observations_added} observations"
+        )
+        for row in result
+    ])
+
+@router.get("/compare", response_model=SpeciesComparisonResponse)
+async def compare_users(
+    user1: int = Query(..., description="First user (usually the caller)"),
+    user2: int = Query(..., description="User to compare against"),
+    year: int = Query(2026, description="Year to filter by"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Compare two users' countable year lists: species only one of them has
+    and how many they share. Private users are not found, as on /species.
+    Cached per user pair until either user imports or edits their profile.
+    """
+    if user1 == user2:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot compare a user with themselves")
+
+    cache_key = (year, user1, user2)
+    cached = compare_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    users = {
+        user.id: user
+        for user in (await db.execute(select(User).filter(User.id.in_([user1, user2])))).scalars()
+    }
+    for user_id in (user1, user2):
+        if user_id not in users or users[user_id].privacy_level == 'private':
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    # Both year lists come from the user_year_species primary key; the full
+    # join splits their union into only-user1, only-user2 and shared
+    result = await db.execute(text("""
+        WITH list1 AS (
+            SELECT scientific_name, common_name FROM user_year_species
+            WHERE user_id = :user1 AND year = :year AND countable
+        ),
+        list2 AS (
+            SELECT scientific_name, common_name FROM user_year_species
+            WHERE user_id = :user2 AND year = :year AND countable
+        )
+        SELECT
+            COALESCE(list1.scientific_name, list2.scientific_name) AS scientific_name,
+            COALESCE(list1.common_name, list2.common_name) AS common_name,
+            list1.scientific_name IS NOT NULL AS in_user1,
+            list2.scientific_name IS NOT NULL AS in_user2
+        FROM list1
+        FULL JOIN list2 ON list1.scientific_name = list2.scientific_name
+        ORDER BY common_name
+    """), {"user1": user1, "user2": user2, "year": year})
+
+    only_user1, only_user2 = [], []
+    shared = 0
+    for row in result:
+        if row.in_user1 and row.in_user2:
+            shared += 1
+        elif row.in_user1:
+            only_user1.append(SpeciesInfo(common_name=row.common_name, scientific_name=row.scientific_name))
+        else:
+            only_user2.append(SpeciesInfo(common_name=row.common_name, scientific_name=row.scientific_name))
+
+    response = SpeciesComparisonResponse(
+        user1=UserSummary(id=user1, name=users[user1].name, species_count=len(only_user1) + shared),
+        user2=UserSummary(id=user2, name=users[user2].name, species_count=len(only_user2) + shared),
+        comparison=ComparisonStats(only_user1=len(only_user1), only_user2=len(only_user2), shared=shared),
+        species_only_user1=only_user1,
+        species_only_user2=only_user2
+    )
+    compare_cache.set(cache_key, response)
+    return response
+
 @router.get("/{user_id}/progress", response_model=MonthlyProgressResponse)
 async def get_user_progress(
     user_id: int,
     year: int = Query(2026, description="Year to filter by"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get monthly progress chart data for a user.
     Returns cumulative species count by month.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
     # Get monthly stats
-    monthly_stats = db.query(MonthlyStat).filter(
-        MonthlyStat.user_id == user_id,
-        MonthlyStat.year == year
-    ).order_by(MonthlyStat.month).all()
+    monthly_stats = (await db.execute(
+        select(MonthlyStat).filter(
+            MonthlyStat.user_id == user_id,
+            MonthlyStat.year == year
+        ).order_by(MonthlyStat.month)
+    )).scalars().all()
 
     # Format for response
     monthly_progress = []
@@ -123,7 +342,7 @@ async def get_user_species(
     user_id: int,
     year: int = Query(2026, description="Year to filter by"),
     sort: str = Query("name", description="Sort by: name or date"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get public species list for a user.
@@ -134,45 +353,26 @@ async def get_user_species(
     Excludes uncountable species (domestics, hybrids, spuhs, slashes).
     """
     # Get user and check privacy
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
     if user.privacy_level == 'private':
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    # Get countable species count
-    count_query = text(f"""
-        SELECT COUNT(DISTINCT scientific_name)
-        FROM observations
-        WHERE user_id = :user_id
-        AND EXTRACT(YEAR FROM observation_date) = :year
-        AND {COUNTABLE_SPECIES_FILTER}
-    """)
-    species_count = db.execute(count_query, {"user_id": user_id, "year": year}).scalar() or 0
-
-    # Get unique species with first observation using DISTINCT ON (faster than correlated subquery)
-    order_clause = "common_name ASC" if sort == "name" else "first_obs DESC"
+    # Read the year list maintained by the importer (one indexed range scan)
+    order_clause = "common_name ASC" if sort == "name" else "first_observation_date DESC"
 
     species_query = text(f"""
-        WITH first_observations AS (
-            SELECT DISTINCT ON (scientific_name)
-                common_name,
-                scientific_name,
-                observation_date as first_obs,
-                state_province
-            FROM observations
-            WHERE user_id = :user_id
-            AND EXTRACT(YEAR FROM observation_date) = :year
-            AND {COUNTABLE_SPECIES_FILTER}
-            ORDER BY scientific_name, observation_date ASC
-        )
-        SELECT common_name, scientific_name, first_obs, state_province
-        FROM first_observations
+        SELECT common_name, scientific_name, first_observation_date, state_province
+        FROM user_year_species
+        WHERE user_id = :user_id
+        AND year = :year
+        AND countable
         ORDER BY {order_clause}
     """)
 
-    result = db.execute(species_query, {"user_id": user_id, "year": year})
+    result = await db.execute(species_query, {"user_id": user_id, "year": year})
     rows = result.fetchall()
 
     # For counts_only users, hide location data
@@ -182,7 +382,7 @@ async def get_user_species(
         PublicSpeciesEntry(
             common_name=row.common_name,
             scientific_name=row.scientific_name,
-            first_observation_date=row.first_obs,
+            first_observation_date=row.first_observation_date,
             state_province=None if hide_location else row.state_province
         )
         for row in rows
@@ -195,7 +395,7 @@ async def get_user_species(
         user_id=user.id,
         user_name=user.name,
         privacy_level=user.privacy_level,
-        species_count=species_count,
+        species_count=len(species_list),
         species=species_list,
         message=message
     )
@@ -2,29 +2,98 @@
 CSV upload endpoints
 """
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import os
-import tempfile
 
-from database import get_db
-from models import User
-from schemas import CSVUploadResponse, CSVUploadStats
-from auth import get_current_user
-from csv_parser import parse_ebird_csv
+from database import get_db, get_async_db
+from models import ImportJob
+from schemas import ImportJobResponse, CSVUploadStats
+from auth import get_token_identity, TokenIdentity
+from import_jobs import enqueue_import
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-@router.post("/csv", response_model=CSVUploadResponse)
-async def upload_csv(
+# Request body limit for uploads: the file plus multipart boundaries and part headers
+MAX_BODY_SIZE = MAX_FILE_SIZE + 64 * 1024
+
+UPLOAD_PATH = "/upload/csv"
+
+
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File size exceeds maximum of {MAX_FILE_SIZE / 1024 / 1024}MB"
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware enforcing the upload limit while the body arrives.
+    Starlette reads and spools the whole multipart body before the handler
+    runs, so the handler alone would accept any size first. A Content-Length
+    over MAX_BODY_SIZE is refused before anything is read; a body without
+    one (chunked) is cut off as soon as it passes the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != UPLOAD_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > MAX_BODY_SIZE:
+            error = file_too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_BODY_SIZE:
+                    # Raised while the form is parsed; the route answers it with 413
+                    raise file_too_large()
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+def job_response(job: ImportJob) -> ImportJobResponse:
+    return ImportJobResponse(
+        job_id=job.id,
+        status=job.status,
+        filename=job.filename,
+        rows_parsed=job.rows_parsed or 0,
+        imported=job.imported or 0,
+        duplicates=job.duplicates or 0,
+        stats=CSVUploadStats(**job.stats) if job.stats else None,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+
+@router.post("/csv", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def upload_csv(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenIdentity = Depends(get_token_identity),
     db: Session = Depends(get_db)
 ):
     """
     Upload eBird CSV file.
-    Parses observations and imports to database.
+    Queues the file for background import and returns the job right away;
+    poll GET /upload/jobs/{job_id} for progress and final statistics.
     Only 2026 observations are imported.
     """
     # Validate file type
@@ -34,44 +103,30 @@ async def upload_csv(
             detail="File must be a CSV file"
         )
 
-    # Read file content
-    contents = await file.read()
+    # The body was already bounded by UploadSizeLimitMiddleware; apply the exact file limit
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise file_too_large()
 
-    # Check file size
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size exceeds maximum of {MAX_FILE_SIZE / 1024 / 1024}MB"
-        )
+    job = enqueue_import(db, current_user.id, file.file, file.filename, target_year=2026)
 
-    # Save to temporary file
-    with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.csv') as temp_file:
-        temp_file.write(contents)
-        temp_file_path = temp_file.name
+    return job_response(job)
 
-    try:
-        # Parse CSV and import observations
-        stats = parse_ebird_csv(temp_file_path, current_user.id, db, target_year=2026)
 
-        return CSVUploadResponse(
-            message="CSV processed successfully",
-            stats=CSVUploadStats(**stats)
+@router.get("/jobs/{job_id}", response_model=ImportJobResponse)
+async def get_import_job(
+    job_id: int,
+    current_user: TokenIdentity = Depends(get_token_identity),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get status, progress and final statistics of an import job"""
+    job = (await db.execute(
+        select(ImportJob).filter(
+            ImportJob.id == job_id,
+            ImportJob.user_id == current_user.id
         )
+    )).scalars().first()
 
-    except ValueError as e:
-        # ValueError is user-facing (missing columns, parse errors)
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
-    except Exception as e:
-        # Log full error server-side, return generic message to client
-        print(f"CSV processing error for user {current_user.id}: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error processing CSV file. Please ensure the file is a valid eBird export."
-        )
-    finally:
-        # Clean up temporary file
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+
+    return job_response(job)
@@ -1,12 +1,13 @@
 """
 User profile and observation endpoints
 """
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
 
-from database import get_db
-from models import User, Observation, GeographicStat
+from database import get_async_db
+from models import User
 from schemas import (
     UserProfileResponse,
     UserUpdate,
@@ -16,41 +17,46 @@ from schemas import (
     GeographicStatsResponse,
     StateStats
 )
-from auth import get_current_user
+from auth import get_current_user, get_current_user_for_update, get_token_identity, TokenIdentity
+from aggregates import sync_user_profile
+from cache import invalidate_comparisons, invalidate_leaderboard, invalidate_user, user_stats_cache
+from pagination import encode_cursor, decode_cursor, cursor_date
 
 router = APIRouter(prefix="/user", tags=["user"])
 
-@router.get("/me", response_model=UserProfileResponse)
-async def get_current_user_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get current user's profile with statistics"""
-    # Get stats from species_summary view
-    stats_query = text("""
-        SELECT species_count, last_upload_date
-        FROM species_summary
-        WHERE user_id = :user_id
-    """)
-    result = db.execute(stats_query, {"user_id": current_user.id}).first()
 
-    # Count total observations
-    total_obs = db.query(func.count(Observation.id)).filter(
-        Observation.user_id == current_user.id,
-        func.extract('year', Observation.observation_date) == 2026
-    ).scalar()
+async def get_user_stats(db: AsyncSession, user_id: int, year: int = 2026) -> UserStats:
+    """
+    Profile statistics from the per-user summary maintained by the importer.
+    Cached per user until their next import completes.
+    """
+    stats = user_stats_cache.get((user_id, year))
+    if stats is not None:
+        return stats
 
-    # Count states visited
-    states_visited = db.query(func.count(func.distinct(GeographicStat.state_province))).filter(
-        GeographicStat.user_id == current_user.id
-    ).scalar()
+    result = (await db.execute(text("""
+        SELECT species_count, total_observations, states_visited, last_upload_date
+        FROM user_year_summary
+        WHERE user_id = :user_id AND year = :year
+    """), {"user_id": user_id, "year": year})).first()
 
     stats = UserStats(
         species_count=result.species_count if result else 0,
-        total_observations=total_obs or 0,
-        states_visited=states_visited or 0,
+        total_observations=result.total_observations if result else 0,
+        states_visited=result.states_visited if result else 0,
         last_upload=result.last_upload_date if result else None
     )
+    user_stats_cache.set((user_id, year), stats)
+    return stats
+
+
+@router.get("/me", response_model=UserProfileResponse)
+async def get_current_user_profile(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get current user's profile with statistics"""
+    stats = await get_user_stats(db, current_user.id)
 
     return UserProfileResponse(
         id=current_user.id,
@@ -65,8 +71,8 @@ async def get_current_user_profile(
 @router.patch("/me", response_model=UserProfileResponse)
 async def update_current_user_profile(
     update_data: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_for_update),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user's profile (name, privacy settings)"""
     if update_data.name is not None:
@@ -80,40 +86,15 @@ async def update_current_user_profile(
             )
         current_user.privacy_level = update_data.privacy_level
 
-    db.commit()
-    db.refresh(current_user)
-
-    # Refresh materialized view to update leaderboard with new name/privacy
-    # CONCURRENTLY allows reads during refresh (requires unique index)
-    try:
-        db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY species_summary;"))
-        db.commit()
-    except Exception as e:
-        print(f"Error refreshing species_summary: {e}")
-
-    # Get updated stats
-    stats_query = text("""
-        SELECT species_count, last_upload_date
-        FROM species_summary
-        WHERE user_id = :user_id
-    """)
-    result = db.execute(stats_query, {"user_id": current_user.id}).first()
+    # Update leaderboard rows with new name/privacy in the same transaction
+    await db.run_sync(sync_user_profile, current_user)
+    await db.commit()
+    invalidate_user(current_user.id)
+    invalidate_leaderboard()
+    invalidate_comparisons(current_user.id)
+    await db.refresh(current_user)
 
-    total_obs = db.query(func.count(Observation.id)).filter(
-        Observation.user_id == current_user.id,
-        func.extract('year', Observation.observation_date) == 2026
-    ).scalar()
-
-    states_visited = db.query(func.count(func.distinct(GeographicStat.state_province))).filter(
-        GeographicStat.user_id == current_user.id
-    ).scalar()
-
-    stats = UserStats(
-        species_count=result.species_count if result else 0,
-        total_observations=total_obs or 0,
-        states_visited=states_visited or 0,
-        last_upload=result.last_upload_date if result else None
-    )
+    stats = await get_user_stats(db, current_user.id)
 
     return UserProfileResponse(
         id=current_user.id,
@@ -125,83 +106,126 @@ async def update_current_user_profile(
         stats=stats
     )
 
+# Columns served from idx_obs_user_date_id; location is free text that can exceed
+# the btree tuple size limit, so it is fetched by primary key for the page only
+OBSERVATION_PAGE_COLUMNS = """
+    id, common_name, scientific_name, count, state_province, county,
+    latitude, longitude, observation_date, observation_time
+"""
+
+
 @router.get("/me/observations", response_model=ObservationListResponse)
 async def get_current_user_observations(
     year: int = Query(2026, description="Year to filter by"),
     state: str = Query(None, description="Optional state filter"),
-    limit: int = Query(100, description="Number of results", le=1000),
-    offset: int = Query(0, description="Pagination offset", ge=0),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(100, description="Number of results", ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(False, description="Count matching rows when filtering by state"),
+    current_user: TokenIdentity = Depends(get_token_identity),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get current user's bird observation list"""
-    query = db.query(Observation).filter(
-        Observation.user_id == current_user.id,
-        func.extract('year', Observation.observation_date) == year
-    )
-
+    """
+    Get current user's bird observation list, newest first.
+    Pages seek past the previous page's (observation_date, id), so every page
+    costs the same however deep it is. total is the year total kept in
+    user_year_summary; with a state filter it is only counted on request.
+    """
+    params = {
+        "user_id": current_user.id,
+        "year": year,
+        "state": state,
+        "limit": limit
+    }
+    filters = """
+        user_id = :user_id
+        AND observation_date >= make_date(:year, 1, 1)
+        AND observation_date < make_date(:year + 1, 1, 1)
+    """
     if state:
-        query = query.filter(Observation.state_province == state)
-
-    # Get total count
-    total = query.count()
-
-    # Get paginated results
-    observations = query.order_by(Observation.observation_date.desc()).limit(limit).offset(offset).all()
-
-    obs_list = []
-    for obs in observations:
-        obs_list.append(ObservationResponse(
-            id=obs.id,
-            common_name=obs.common_name,
-            scientific_name=obs.scientific_name,
-            count=obs.count or '',
-            state_province=obs.state_province,
-            county=obs.county,
-            location=obs.location,
-            latitude=obs.latitude,
-            longitude=obs.longitude,
-            observation_date=obs.observation_date,
-            observation_time=str(obs.observation_time) if obs.observation_time else None
-        ))
+        filters += " AND state_province = :state"
+
+    seek = ""
+    if cursor:
+        after = decode_cursor(cursor, "observation_date", "id")
+        seek = " AND (observation_date, id) < (CAST(:cursor_date AS DATE), :cursor_id)"
+        params.update({"cursor_date": cursor_date(after["observation_date"]), "cursor_id": after["id"]})
+
+    page_query = text(f"""
+        WITH page AS (
+            SELECT {OBSERVATION_PAGE_COLUMNS}
+            FROM observations
+            WHERE {filters} {seek}
+            ORDER BY observation_date DESC, id DESC
+            LIMIT :limit
+        )
+        SELECT page.*, o.location
+        FROM page
+        JOIN observations o ON o.id = page.id AND o.observation_date = page.observation_date
+        ORDER BY page.observation_date DESC, page.id DESC
+    """)
+    rows = (await db.execute(page_query, params)).fetchall()
+
+    obs_list = [
+        ObservationResponse(
+            id=row.id,
+            common_name=row.common_name,
+            scientific_name=row.scientific_name,
+            count=row.count or '',
+            state_province=row.state_province,
+            county=row.county,
+            location=row.location,
+            latitude=row.latitude,
+            longitude=row.longitude,
+            observation_date=row.observation_date,
+            observation_time=str(row.observation_time) if row.observation_time else None
+        )
+        for row in rows
+    ]
+
+    total = None
+    if not state:
+        total = (await db.execute(text("""
+            SELECT total_observations FROM user_year_summary
+            WHERE user_id = :user_id AND year = :year
+        """), params)).scalar() or 0
+    elif include_total:
+        total = (await db.execute(text(f"SELECT COUNT(*) FROM observations WHERE {filters}"), params)).scalar()
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor({"observation_date": last.observation_date, "id": last.id})
 
     return ObservationListResponse(
         observations=obs_list,
-        total=total
+        total=total,
+        next_cursor=next_cursor
     )
 
 @router.get("/me/geographic-stats", response_model=GeographicStatsResponse)
 async def get_current_user_geographic_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    year: int = Query(2026),
+    current_user: TokenIdentity = Depends(get_token_identity),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get states/counties visited by current user"""
-    # Group by state and collect counties
-    geo_stats = db.query(GeographicStat).filter(
-        GeographicStat.user_id == current_user.id
-    ).order_by(GeographicStat.state_province).all()
-
-    # Group by state
-    states_dict = {}
-    for stat in geo_stats:
-        state = stat.state_province
-        if state not in states_dict:
-            states_dict[state] = {
-                "species_count": 0,
-                "counties": []
-            }
-
-        states_dict[state]["species_count"] += stat.species_count
-        if stat.county:
-            states_dict[state]["counties"].append(stat.county)
-
-    # Format response
-    states_visited = []
-    for state, data in states_dict.items():
-        states_visited.append(StateStats(
-            state=state,
-            species_count=data["species_count"],
-            counties=list(set(data["counties"]))  # Deduplicate counties
-        ))
-
-    return GeographicStatsResponse(states_visited=states_visited)
+    """Get states/counties visited by current user, with distinct species per state"""
+    rows = (await db.execute(text("""
+        SELECT
+            s.state_province,
+            s.species_count,
+            COALESCE(
+                array_agg(g.county ORDER BY g.county) FILTER (WHERE g.county IS NOT NULL),
+                '{}'
+            ) AS counties
+        FROM user_state_stats s
+        LEFT JOIN geographic_stats g
+            ON g.user_id = s.user_id AND g.year = s.year AND g.state_province = s.state_province
+        WHERE s.user_id = :user_id AND s.year = :year
+        GROUP BY s.state_province, s.species_count
+        ORDER BY s.state_province
+    """), {"user_id": current_user.id, "year": year})).all()
+
+    return GeographicStatsResponse(states_visited=[
+        StateStats(state=row.state_province, species_count=row.species_count, counties=list(row.counties))
+        for row in rows
+    ])
@@ -67,20 +67,37 @@ class ObservationResponse(BaseModel):
 
 class ObservationListResponse(BaseModel):
     observations: List[ObservationResponse]
-    total: int
+    total: Optional[int]
+    next_cursor: Optional[str] = None
 
 # CSV Upload schemas
 class CSVUploadStats(BaseModel):
     total_rows: int
     imported: int
+    updated: int = 0
     duplicates: int
+    unchanged: int = 0
     species_count: int
+    checklists: int = 0
+    unchanged_checklists: int = 0
     date_range: dict
 
 class CSVUploadResponse(BaseModel):
     message: str
     stats: CSVUploadStats
 
+class ImportJobResponse(BaseModel):
+    job_id: int
+    status: str
+    filename: Optional[str] = None
+    rows_parsed: int
+    imported: int
+    duplicates: int
+    stats: Optional[CSVUploadStats] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 # Leaderboard schemas
 class LeaderboardEntry(BaseModel):
     rank: int
@@ -94,6 +111,7 @@ class LeaderboardResponse(BaseModel):
     year: int
     participants: int
     leaderboard: List[LeaderboardEntry]
+    next_cursor: Optional[str] = None
 
 # Monthly progress schemas
 class MonthlyProgress(BaseModel):
@@ -134,6 +152,7 @@ class SpeciesComparisonResponse(BaseModel):
     user1: UserSummary
     user2: UserSummary
     comparison: ComparisonStats
+    species_only_user1: List[SpeciesInfo]
     species_only_user2: List[SpeciesInfo]
 
 # Public user species list schemas
@@ -0,0 +1,31 @@
+"""
+Countable-species classification.
+
+Domestics, hybrids, spuhs and slashes do not count toward a year list.
+Countability is decided once per observation at import time and stored in
+observations.countable / user_year_species.countable, so queries filter on
+a stored boolean instead of pattern-matching common names.
+"""
+import re
+import pandas as pd
+
+# Substrings of eBird common names that mark an uncountable taxon
+UNCOUNTABLE_NAME_PATTERNS = (
+    "(Domestic",  # domestic
+    "hybrid",     # hybrid
+    " x ",        # hybrid / intergrade
+    "/",          # slash
+    "sp.",        # spuh
+)
+
+_UNCOUNTABLE_REGEX = "|".join(re.escape(pattern) for pattern in UNCOUNTABLE_NAME_PATTERNS)
+
+# The same rule in SQL, for backfilling rows imported before the flag existed
+COUNTABLE_NAME_SQL = " AND ".join(
+    f"common_name NOT LIKE '%%{pattern}%%'" for pattern in UNCOUNTABLE_NAME_PATTERNS
+)
+
+
+def countable_mask(common_names: pd.Series) -> pd.Series:
+    """Return a boolean Series that is True for countable species"""
+    return ~common_names.astype(str).str.contains(_UNCOUNTABLE_REGEX, regex=True)
@@ -3,6 +3,16 @@
 
 -- Drop existing tables/views if they exist
 DROP MATERIALIZED VIEW IF EXISTS species_summary CASCADE;
+DROP FUNCTION IF EXISTS refresh_species_summary();
+DROP TABLE IF EXISTS materialized_view_refreshes CASCADE;
+DROP TABLE IF EXISTS schema_version CASCADE;
+DROP TABLE IF EXISTS import_events CASCADE;
+DROP TABLE IF EXISTS import_jobs CASCADE;
+DROP TABLE IF EXISTS checklist_digests CASCADE;
+DROP TABLE IF EXISTS user_year_summary CASCADE;
+DROP TABLE IF EXISTS user_year_species CASCADE;
+DROP TABLE IF EXISTS user_state_stats CASCADE;
+DROP TABLE IF EXISTS user_county_species CASCADE;
 DROP TABLE IF EXISTS geographic_stats CASCADE;
 DROP TABLE IF EXISTS monthly_stats CASCADE;
 DROP TABLE IF EXISTS observations CASCADE;
@@ -23,9 +33,11 @@ CREATE TABLE users (
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_magic_token ON users(magic_link_token);
 
--- Observations table (stores all eBird CSV data)
+-- Observations table (stores all eBird CSV data), range-partitioned by
+-- observation_date with one partition per year; filter on date ranges so
+-- other years' partitions are pruned
 CREATE TABLE observations (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     submission_id VARCHAR(50) NOT NULL,
     common_name VARCHAR(255) NOT NULL,
@@ -50,15 +62,28 @@ CREATE TABLE observations (
     observation_details TEXT,
     checklist_comments TEXT,
     ml_catalog_numbers TEXT,
+    countable BOOLEAN NOT NULL DEFAULT TRUE,
     uploaded_at TIMESTAMP DEFAULT NOW(),
-    UNIQUE(user_id, submission_id, scientific_name)
-);
+    -- Partition keys must be part of unique keys; imports also skip a species already
+    -- on the checklist under another date (observation_loader.merge_staging)
+    PRIMARY KEY (id, observation_date),
+    CONSTRAINT observations_user_submission_species_key
+        UNIQUE (user_id, submission_id, scientific_name, observation_date)
+) PARTITION BY RANGE (observation_date);
+
+-- The app creates partitions for new years on startup and before imports
+CREATE TABLE observations_2025 PARTITION OF observations FOR VALUES FROM ('2025-01-01') TO ('2026-01-01');
+CREATE TABLE observations_2026 PARTITION OF observations FOR VALUES FROM ('2026-01-01') TO ('2027-01-01');
+CREATE TABLE observations_2027 PARTITION OF observations FOR VALUES FROM ('2027-01-01') TO ('2028-01-01');
 
 CREATE INDEX idx_obs_user_date ON observations(user_id, observation_date);
 CREATE INDEX idx_obs_date ON observations(observation_date);
 CREATE INDEX idx_obs_submission ON observations(submission_id);
 CREATE INDEX idx_obs_species ON observations(scientific_name);
 CREATE INDEX idx_obs_state ON observations(state_province);
+-- Observation list pages: seek on (observation_date, id) and filter without heap visits
+CREATE INDEX idx_obs_user_date_id ON observations(user_id, observation_date DESC, id DESC)
+    INCLUDE (common_name, scientific_name, count, state_province, county, latitude, longitude, observation_time);
 
 -- Monthly stats table
 CREATE TABLE monthly_stats (
@@ -79,114 +104,146 @@ CREATE INDEX idx_monthly_user_year ON monthly_stats(user_id, year);
 CREATE TABLE geographic_stats (
     id SERIAL PRIMARY KEY,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
     state_province VARCHAR(10) NOT NULL,
     county VARCHAR(100),
     species_count INTEGER NOT NULL,
     first_observation DATE,
-    last_observation DATE,
-    UNIQUE(user_id, state_province, county)
+    last_observation DATE
 );
 
+CREATE UNIQUE INDEX idx_geo_user_year_county ON geographic_stats(user_id, year, state_province, COALESCE(county, ''));
 CREATE INDEX idx_geo_user ON geographic_stats(user_id);
 CREATE INDEX idx_geo_state ON geographic_stats(state_province);
 
--- Species summary materialized view (for leaderboard)
--- Excludes uncountable species: domestics, hybrids, spuhs, slashes
-CREATE MATERIALIZED VIEW species_summary AS
-SELECT
-    u.id AS user_id,
-    u.name AS user_name,
-    u.email AS user_email,
-    u.privacy_level,
-    COUNT(DISTINCT o.scientific_name) AS species_count,
-    MAX(o.observation_date) AS last_observation_date,
-    MAX(o.uploaded_at) AS last_upload_date
-FROM users u
-LEFT JOIN observations o ON u.id = o.user_id
-    AND EXTRACT(YEAR FROM o.observation_date) = 2026
-    AND o.common_name NOT LIKE '%(Domestic%'
-    AND o.common_name NOT LIKE '%hybrid%'
-    AND o.common_name NOT LIKE '% x %'
-    AND o.common_name NOT LIKE '%/%'
-    AND o.common_name NOT LIKE '%sp.%'
-GROUP BY u.id, u.name, u.email, u.privacy_level
-ORDER BY species_count DESC, last_observation_date DESC;
-
-CREATE UNIQUE INDEX idx_species_summary_user ON species_summary(user_id);
-
--- Function to refresh species summary
-CREATE OR REPLACE FUNCTION refresh_species_summary()
-RETURNS void AS $$
-BEGIN
-    REFRESH MATERIALIZED VIEW CONCURRENTLY species_summary;
-END;
-$$ LANGUAGE plpgsql;
-
--- Function to calculate monthly stats for a user
-CREATE OR REPLACE FUNCTION calculate_monthly_stats(p_user_id INTEGER, p_year INTEGER)
-RETURNS void AS $$
-BEGIN
-    DELETE FROM monthly_stats WHERE user_id = p_user_id AND year = p_year;
-
-    INSERT INTO monthly_stats (user_id, year, month, species_count, total_observations)
-    SELECT
-        p_user_id,
-        p_year,
-        EXTRACT(MONTH FROM observation_date)::INTEGER,
-        COUNT(DISTINCT scientific_name),
-        COUNT(*)
-    FROM observations
-    WHERE user_id = p_user_id
-      AND EXTRACT(YEAR FROM observation_date) = p_year
-    GROUP BY EXTRACT(MONTH FROM observation_date)
-    ORDER BY EXTRACT(MONTH FROM observation_date);
-
-    -- Calculate new species count (cumulative)
-    WITH monthly_cumulative AS (
-        SELECT
-            month,
-            species_count,
-            LAG(species_count, 1, 0) OVER (ORDER BY month) AS prev_species_count
-        FROM monthly_stats
-        WHERE user_id = p_user_id AND year = p_year
-        ORDER BY month
-    )
-    UPDATE monthly_stats ms
-    SET new_species_count = mc.species_count - mc.prev_species_count
-    FROM monthly_cumulative mc
-    WHERE ms.user_id = p_user_id
-      AND ms.year = p_year
-      AND ms.month = mc.month;
-END;
-$$ LANGUAGE plpgsql;
-
--- Function to calculate geographic stats for a user
-CREATE OR REPLACE FUNCTION calculate_geographic_stats(p_user_id INTEGER)
-RETURNS void AS $$
-BEGIN
-    DELETE FROM geographic_stats WHERE user_id = p_user_id;
-
-    INSERT INTO geographic_stats (user_id, state_province, county, species_count, first_observation, last_observation)
-    SELECT
-        p_user_id,
-        state_province,
-        county,
-        COUNT(DISTINCT scientific_name),
-        MIN(observation_date),
-        MAX(observation_date)
-    FROM observations
-    WHERE user_id = p_user_id
-      AND state_province IS NOT NULL
-    GROUP BY state_province, county;
-END;
-$$ LANGUAGE plpgsql;
+-- Species seen per user, year and county ('' when the county is unknown);
+-- lets imports recount only the counties and states they touch
+CREATE TABLE user_county_species (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    state_province VARCHAR(10) NOT NULL,
+    county VARCHAR(100) NOT NULL DEFAULT '',
+    scientific_name VARCHAR(255) NOT NULL,
+    PRIMARY KEY (user_id, year, state_province, county, scientific_name)
+);
+
+-- Exact distinct species per user, year and state
+CREATE TABLE user_state_stats (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    state_province VARCHAR(10) NOT NULL,
+    species_count INTEGER NOT NULL,
+    first_observation DATE,
+    last_observation DATE,
+    PRIMARY KEY (user_id, year, state_province)
+);
+
+-- Per-user leaderboard aggregates, maintained incrementally by the importer
+-- and on profile changes
+CREATE TABLE user_year_summary (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    user_name VARCHAR(255) NOT NULL,
+    user_email VARCHAR(255) NOT NULL,
+    privacy_level VARCHAR(20) NOT NULL,
+    species_count INTEGER NOT NULL DEFAULT 0,
+    total_observations INTEGER NOT NULL DEFAULT 0,
+    states_visited INTEGER NOT NULL DEFAULT 0,
+    last_observation_date DATE,
+    last_upload_date TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, year)
+);
+
+-- Leaderboard order; the expression must match RANK_DATE in routers/leaderboard.py
+CREATE INDEX idx_user_year_summary_leaderboard ON user_year_summary(
+    year, species_count DESC, COALESCE(last_observation_date, '-infinity'::date) DESC, user_id DESC
+) WHERE privacy_level != 'private';
+
+-- Per-user year list: first sighting of each species, upserted by the importer
+CREATE TABLE user_year_species (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    scientific_name VARCHAR(255) NOT NULL,
+    common_name VARCHAR(255) NOT NULL,
+    first_observation_date DATE NOT NULL,
+    state_province VARCHAR(10),
+    countable BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (user_id, year, scientific_name)
+);
+
+CREATE INDEX idx_user_year_species_species ON user_year_species(year, scientific_name);
+
+-- Append-only log of imports that added observations (activity feed)
+CREATE TABLE import_events (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    observations_added INTEGER NOT NULL,
+    species_added INTEGER NOT NULL,
+    notable_species TEXT[] NOT NULL DEFAULT '{}',
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_import_events_year ON import_events(year, id DESC);
+
+-- Background CSV import jobs (polled via GET /upload/jobs/{id})
+CREATE TABLE import_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    filename VARCHAR(255),
+    rows_parsed INTEGER NOT NULL DEFAULT 0,
+    imported INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    stats JSONB,
+    error TEXT,
+    content_hash VARCHAR(64),
+    target_year INTEGER,
+    worker_id VARCHAR(32),
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX idx_import_jobs_user ON import_jobs(user_id, created_at DESC);
+CREATE INDEX idx_import_jobs_content ON import_jobs(user_id, content_hash) WHERE status = 'completed';
+CREATE INDEX idx_import_jobs_unfinished ON import_jobs(worker_id) WHERE status IN ('queued', 'running');
+
+-- Digest of each imported checklist's CSV rows; unchanged checklists are skipped on re-upload
+CREATE TABLE checklist_digests (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    submission_id VARCHAR(50) NOT NULL,
+    digest BIGINT NOT NULL,
+    row_count INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, submission_id)
+);
+
+-- Applied migrations (backend/migrations.py). This file is the schema as of
+-- the baseline version below; bump it whenever a migration is added.
+CREATE TABLE schema_version (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    duration_ms INTEGER
+);
+
+INSERT INTO schema_version (version, description) VALUES (12, 'database/schema.sql baseline');
 
 -- Comments
 COMMENT ON TABLE users IS 'Participant accounts and authentication tokens';
 COMMENT ON TABLE observations IS 'All eBird observations imported from CSV files';
-COMMENT ON TABLE monthly_stats IS 'Monthly species count progression for progress charts';
-COMMENT ON TABLE geographic_stats IS 'Geographic coverage statistics (states/counties visited)';
-COMMENT ON MATERIALIZED VIEW species_summary IS 'Leaderboard view with species counts per user';
-COMMENT ON FUNCTION refresh_species_summary() IS 'Refresh the species_summary materialized view';
-COMMENT ON FUNCTION calculate_monthly_stats(INTEGER, INTEGER) IS 'Recalculate monthly statistics for a user';
-COMMENT ON FUNCTION calculate_geographic_stats(INTEGER) IS 'Recalculate geographic statistics for a user';
+COMMENT ON COLUMN observations.countable IS 'FALSE for domestics, hybrids, spuhs and slashes; set at import time';
+COMMENT ON TABLE monthly_stats IS 'Cumulative year list and new species per month, upserted by the importer';
+COMMENT ON TABLE geographic_stats IS 'Per-year county coverage (species and first/last observation), upserted by the importer';
+COMMENT ON TABLE user_county_species IS 'Species seen per user, year and county, for incremental geographic stats';
+COMMENT ON TABLE user_state_stats IS 'Exact distinct species per user, year and state';
+COMMENT ON TABLE user_year_summary IS 'Per-user, per-year leaderboard and profile aggregates';
+COMMENT ON TABLE user_year_species IS 'First observation of each species per user and year (year list)';
+COMMENT ON TABLE schema_version IS 'Applied schema migration versions (backend/migrations.py)';
+COMMENT ON TABLE import_events IS 'One row per import that added observations: new year species and the rarest of them';
+COMMENT ON TABLE import_jobs IS 'Status and progress of background CSV imports';
+COMMENT ON COLUMN import_jobs.worker_id IS 'Process that queued the job; its advisory lock is free once that process is gone';
+COMMENT ON COLUMN import_jobs.content_hash IS 'SHA-256 of the uploaded file; a completed job with the same hash answers identical re-uploads';
+COMMENT ON TABLE checklist_digests IS 'Order-independent hash and row count of each imported checklist (backend/checklist_digests.py)';
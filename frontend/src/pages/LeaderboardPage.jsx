@@ -11,6 +11,33 @@ const NEW_FEATURES = [
   { date: '2026-01-12', text: 'Privacy: "Counts Only" now shows species but hides locations' },
 ];
 
+// Rows requested from /leaderboard; live updates keep the table at this size
+const LEADERBOARD_LIMIT = 100;
+
+// Sort by species count, then most recent observation, and assign competition ranks (1, 1, 3)
+function rankEntries(entries) {
+  const sorted = [...entries].sort((a, b) =>
+    b.species_count - a.species_count
+    || (b.last_observation_date || '').localeCompare(a.last_observation_date || '')
+    || b.user_id - a.user_id
+  );
+  let rank = 0;
+  return sorted.map((entry, index) => {
+    if (index === 0 || sorted[index - 1].species_count !== entry.species_count) {
+      rank = index + 1;
+    }
+    return { ...entry, rank };
+  });
+}
+
+// Replace one user's row with a streamed update and re-rank the table
+function applyLeaderboardUpdate(entries, update) {
+  const others = entries.filter((entry) => entry.user_id !== update.user_id);
+  if (update.removed) return rankEntries(others);
+  const { reason, participants, ...entry } = update;
+  return rankEntries([...others, entry]).slice(0, LEADERBOARD_LIMIT);
+}
+
 function LeaderboardPage() {
   const [leaderboard, setLeaderboard] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -31,14 +58,27 @@ function LeaderboardPage() {
 
   useEffect(() => {
     fetchLeaderboard();
+
+    // Rank and count changes are pushed after each import or profile change
+    const source = new EventSource(`${api.defaults.baseURL}/leaderboard/stream?year=2026`);
+    source.addEventListener('update', (event) => {
+      const update = JSON.parse(event.data);
+      setLeaderboard((entries) => applyLeaderboardUpdate(entries, update));
+      if (update.participants !== undefined) {
+        setParticipants(update.participants);
+      }
+    });
+    // Updates were missed (slow client or server reconnect); reload quietly
+    source.addEventListener('reset', () => fetchLeaderboard(false));
+    return () => source.close();
   }, []);
 
-  const fetchLeaderboard = async () => {
-    setLoading(true);
+  const fetchLeaderboard = async (showLoading = true) => {
+    setLoading(showLoading);
     setError('');
 
     try {
-      const response = await api.get('/leaderboard?year=2026');
+      const response = await api.get(`/leaderboard?year=2026&limit=${LEADERBOARD_LIMIT}`);
       setLeaderboard(response.data.leaderboard);
       setParticipants(response.data.participants);
     } catch (err) {
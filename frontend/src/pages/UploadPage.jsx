@@ -3,12 +3,15 @@ import { Link, useNavigate } from 'react-router-dom';
 import api from '../services/api';
 import { logout } from '../services/auth';
 
+const JOB_POLL_INTERVAL_MS = 1500;
+
 function UploadPage() {
   const [file, setFile] = useState(null);
   const [uploading, setUploading] = useState(false);
   const [success, setSuccess] = useState(false);
   const [error, setError] = useState('');
   const [stats, setStats] = useState(null);
+  const [rowsParsed, setRowsParsed] = useState(0);
   const fileInputRef = useRef(null);
   const navigate = useNavigate();
 
@@ -50,6 +53,7 @@ function UploadPage() {
     setUploading(true);
     setError('');
     setSuccess(false);
+    setRowsParsed(0);
 
     const formData = new FormData();
     formData.append('file', file);
@@ -61,8 +65,21 @@ function UploadPage() {
         },
       });
 
+      // Import runs in the background; poll the job until it finishes
+      let job = response.data;
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        job = (await api.get(`/upload/jobs/${job.job_id}`)).data;
+        setRowsParsed(job.rows_parsed);
+      }
+
+      if (job.status === 'failed') {
+        setError(job.error || 'Failed to upload CSV. Please try again.');
+        return;
+      }
+
       setSuccess(true);
-      setStats(response.data.stats);
+      setStats(job.stats);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to upload CSV. Please try again.');
     } finally {
@@ -136,6 +153,16 @@ function UploadPage() {
                     <div style={{ fontSize: '14px', color: '#666' }}>
                       Date Range: {stats.date_range.earliest} to {stats.date_range.latest}
                     </div>
+                    {stats.unchanged_checklists > 0 && (
+                      <div style={{ fontSize: '14px', color: '#666', marginTop: '5px' }}>
+                        {stats.unchanged_checklists} of {stats.checklists} checklists ({stats.unchanged} observations) unchanged since your last upload
+                      </div>
+                    )}
+                    {stats.updated > 0 && (
+                      <div style={{ fontSize: '14px', color: '#666', marginTop: '5px' }}>
+                        {stats.updated} observations updated with edits from eBird
+                      </div>
+                    )}
                   </div>
                 )}
               </div>
@@ -209,7 +236,7 @@ function UploadPage() {
                 className="btn btn-primary"
                 style={{ width: '100%', marginTop: '20px' }}
               >
-                {uploading ? 'Uploading...' : 'Upload CSV'}
+                {uploading ? (rowsParsed ? `Processing... ${rowsParsed.toLocaleString()} rows` : 'Uploading...') : 'Upload CSV'}
               </button>
             </>
           )}